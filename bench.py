@@ -0,0 +1,280 @@
+"""
+    Loopback benchmark suite for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 bench.py run [options] [-o results.json] [--csv results.csv]
+           python3 bench.py compare old.json new.json [--threshold 0.1]
+    coding: utf-8
+
+    Notes:
+        run sends every file over loopback with sender.py and receiver.py, once per combination of
+        --max-win, --rot, --flp and --rlp, on ports picked fresh for every transfer:
+            python3 bench.py run
+            python3 bench.py run --generate 10M 1G --max-win 4000 64000 --flp 0 0.1 --rlp 0 0.1 --repeat 3
+        Files default to the bundled random1.txt, random2.txt and asyoulik.txt, --generate adds random
+        files of the given sizes (K, M and G are powers of 1000). Generated files and the receiver's
+        drops are seeded with --seed, repetition i of a combination uses seed + i, so two runs with the
+        same options send the same bytes and drop the same segments.
+        Every received file is compared with the one sent. For every transfer the completion time,
+        throughput, retransmissions and the CPU time of both processes are printed and written to the
+        JSON file given with -o and the CSV file given with --csv, along with the sender's and
+        receiver's --summary stats. The completion time is the sender's own, from its SYN to the end of
+        its close, so interpreter start-up is left out, wall_time is the whole sender process. Throughput
+        is the goodput of the file: its size over the completion time.
+        --relay-args runs every transfer through relay.py with those options, seeded as the receiver,
+        to measure the sender over a given delay, bandwidth and loss pattern rather than bare loopback.
+        compare matches the transfers of two result files by their combination, takes the median over
+        repetitions and flags as a regression a throughput or CPU time worse by more than --threshold
+        (default 10%), more retransmissions, or a transfer that no longer completes. It exits with 1
+        if anything regressed. It also shows the goodput gained by an option, here compression over a
+        bandwidth-limited link:
+            python3 bench.py run -o raw.json --relay-args "--rate 200K"
+            python3 bench.py run -o zlib.json --relay-args "--rate 200K" --sender-args=--compress
+            python3 bench.py compare raw.json zlib.json
+"""
+import os, sys, json, csv, time, shlex, socket, random, resource, subprocess, tempfile, filecmp, argparse, platform, statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FILES = ["random1.txt", "random2.txt", "asyoulik.txt"]
+UNITS = {"K": 1000, "M": 1000 ** 2, "G": 1000 ** 3}
+# CPU time differences below this many seconds are not flagged, process start-up alone varies by about as much
+CPU_NOISE = 0.05
+# a combination is identified by these fields in compare
+KEY = ("file", "size", "max_win", "rot", "flp", "rlp")
+FIELDS = KEY + ("repeat", "seed", "status", "time", "wall_time", "throughput", "wire_bytes", "segments", "retransmitted", "duplicate_acks",
+                "dropped_data", "dropped_acks", "srtt_ms", "sender_cpu", "receiver_cpu")
+
+# a UDP port that is free right now
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_size(text):
+    unit = UNITS.get(text[-1].upper())
+    return int(float(text[:-1]) * unit) if unit else int(text)
+
+# write size bytes of seeded random data to path, unless a file of that size is already there
+def generate(path, size, seed):
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return
+    print(f"generating {path}", file=sys.stderr)
+    rng = random.Random(seed)
+    with open(path, 'wb') as file:
+        left = size
+        while left:
+            chunk = min(left, 1024 * 1024)
+            file.write(rng.randbytes(chunk))
+            left -= chunk
+
+# CPU time, user and system, of the children waited for so far
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def read_summary(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+# send path once and return its result row
+def transfer(path, max_win, rot, flp, rlp, seed, timeout, sender_args=(), receiver_args=(), relay_args=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        receiver_port, sender_port = free_port(), free_port()
+        received = os.path.join(tmp, "received.bin")
+        receiver = subprocess.Popen([sys.executable, os.path.join(HERE, "receiver.py"), str(receiver_port), str(sender_port), received,
+                                     str(flp), str(rlp), "--seed", str(seed), "--summary", *receiver_args],
+                                    cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # with a relay the sender sends to it, and it forwards to the receiver
+        relay = None
+        target_port = receiver_port
+        if relay_args is not None:
+            target_port = free_port()
+            relay = subprocess.Popen([sys.executable, os.path.join(HERE, "relay.py"), str(target_port), str(receiver_port),
+                                      "--seed", str(seed), *relay_args],
+                                     cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(0.3)
+        status = "ok"
+        cpu = children_cpu()
+        start = time.perf_counter()
+        try:
+            subprocess.run([sys.executable, os.path.join(HERE, "sender.py"), str(sender_port), str(target_port), path, str(max_win), str(rot),
+                            "--summary", *sender_args],
+                           cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout, check=True)
+        except subprocess.TimeoutExpired:
+            status = "timeout"
+        except subprocess.CalledProcessError:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        sender_cpu = children_cpu() - cpu
+        # the receiver waits out TIME_WAIT before it exits
+        try:
+            receiver.wait(timeout=timeout if status == "ok" else 1)
+        except subprocess.TimeoutExpired:
+            receiver.kill()
+            receiver.wait()
+            if status == "ok":
+                status = "timeout"
+        receiver_cpu = children_cpu() - cpu - sender_cpu
+        if relay is not None:
+            relay.terminate()
+            relay.wait()
+        if status == "ok" and not (os.path.exists(received) and filecmp.cmp(path, received, shallow=False)):
+            status = "mismatch"
+        sent = read_summary(os.path.join(tmp, "Sender_log.json"))
+        received_stats = read_summary(os.path.join(tmp, "Receiver_log.json"))
+    size = os.path.getsize(path)
+    # the transfer itself, without starting the interpreter and importing the modules
+    transfer_time = sent.get("elapsed") or elapsed
+    return {
+        "file": os.path.basename(path),
+        "size": size,
+        "max_win": max_win,
+        "rot": rot,
+        "flp": flp,
+        "rlp": rlp,
+        "seed": seed,
+        "status": status,
+        "time": round(transfer_time, 4),
+        "wall_time": round(elapsed, 4),
+        "throughput": round(size / transfer_time, 1) if status == "ok" else None,
+        # bytes of DATA segments sent, less than size when the sender compresses
+        "wire_bytes": sent.get("bytes_sent"),
+        "segments": sent.get("segments_sent"),
+        "retransmitted": sent.get("retransmitted"),
+        "duplicate_acks": sent.get("duplicate_acks"),
+        "dropped_data": received_stats.get("dropped_data"),
+        "dropped_acks": received_stats.get("dropped_acks"),
+        "srtt_ms": (sent.get("rtt") or {}).get("srtt_ms"),
+        "sender_cpu": round(sender_cpu, 4),
+        "receiver_cpu": round(receiver_cpu, 4),
+        "sender": sent,
+        "receiver": received_stats,
+    }
+
+def run(args):
+    if args.cache:
+        os.makedirs(args.cache, exist_ok=True)
+        return run_grid(args, args.cache)
+    with tempfile.TemporaryDirectory(prefix="ptp-bench-") as cache:
+        return run_grid(args, cache)
+
+def run_grid(args, cache):
+    files = [path if os.path.isabs(path) else os.path.join(HERE, path) for path in (args.files or FILES)]
+    for text in args.generate:
+        size = parse_size(text)
+        path = os.path.join(cache, f"generated-{text}.bin")
+        generate(path, size, args.seed)
+        files.append(path)
+
+    results = []
+    print(f"{'file':<22}{'max_win':>9}{'rot':>6}{'flp':>6}{'rlp':>6}{'time (s)':>10}{'MB/s':>9}{'wire':>7}{'retx':>7}{'cpu (s)':>9}  status")
+    for path in files:
+        for max_win in args.max_win:
+            for rot in args.rot:
+                for flp in args.flp:
+                    for rlp in args.rlp:
+                        for repeat in range(args.repeat):
+                            result = transfer(path, max_win, rot, flp, rlp, args.seed + repeat, args.timeout,
+                                              args.sender_args, args.receiver_args, args.relay_args)
+                            result["repeat"] = repeat
+                            results.append(result)
+                            throughput = f"{result['throughput'] / 1e6:.2f}" if result["throughput"] else "-"
+                            # wire bytes as a share of the file
+                            wire = f"{result['wire_bytes'] / result['size']:.0%}" if result["wire_bytes"] is not None and result["size"] else "-"
+                            print(f"{result['file']:<22}{max_win:>9}{rot:>6}{flp:>6}{rlp:>6}{result['time']:>10.2f}{throughput:>9}{wire:>7}"
+                                  f"{result['retransmitted'] if result['retransmitted'] is not None else '-':>7}"
+                                  f"{result['sender_cpu'] + result['receiver_cpu']:>9.2f}  {result['status']}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(), "time": time.time(),
+                       "seed": args.seed, "relay_args": args.relay_args, "results": results}, file, indent=2)
+            file.write("\n")
+    if args.csv:
+        with open(args.csv, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+# median of a field over the repetitions of every combination
+def summarize(results):
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[key] for key in KEY), []).append(result)
+    summary = {}
+    for key, group in groups.items():
+        done = [result for result in group if result["status"] == "ok"]
+        median = lambda field: statistics.median(result[field] for result in done) if done and all(result[field] is not None for result in done) else None
+        summary[key] = {
+            "ok": len(done) == len(group),
+            "throughput": median("throughput"),
+            "retransmitted": median("retransmitted"),
+            "cpu": statistics.median(result["sender_cpu"] + result["receiver_cpu"] for result in done) if done else None,
+        }
+    return summary
+
+def compare(args):
+    with open(args.old) as file:
+        old = summarize(json.load(file)["results"])
+    with open(args.new) as file:
+        new = summarize(json.load(file)["results"])
+    regressions = 0
+    print(f"{'file':<22}{'max_win':>9}{'rot':>6}{'flp':>6}{'rlp':>6}{'MB/s old':>10}{'new':>8}{'change':>8}{'cpu old':>9}{'new':>7}")
+    for key in sorted(old.keys() & new.keys(), key=str):
+        before, after = old[key], new[key]
+        flags = []
+        if before["ok"] and not after["ok"]:
+            flags.append("FAILED")
+        change = None
+        if before["throughput"] and after["throughput"]:
+            change = after["throughput"] / before["throughput"] - 1
+            if change < -args.threshold:
+                flags.append("SLOWER")
+        if before["cpu"] and after["cpu"] and after["cpu"] > before["cpu"] * (1 + args.threshold) + CPU_NOISE:
+            flags.append("CPU")
+        if before["retransmitted"] is not None and after["retransmitted"] is not None and after["retransmitted"] > before["retransmitted"]:
+            flags.append("RETX")
+        regressions += bool(flags)
+        file, _, max_win, rot, flp, rlp = key
+        fmt = lambda value, scale=1e6: f"{value / scale:.2f}" if value else "-"
+        print(f"{file:<22}{max_win:>9}{rot:>6}{flp:>6}{rlp:>6}{fmt(before['throughput']):>10}{fmt(after['throughput']):>8}"
+              f"{'-' if change is None else f'{change:+.1%}':>8}{fmt(before['cpu'], 1):>9}{fmt(after['cpu'], 1):>7}  {' '.join(flags)}")
+    for key in sorted(old.keys() - new.keys(), key=str):
+        print(f"only in {args.old}: {key}")
+    for key in sorted(new.keys() - old.keys(), key=str):
+        print(f"only in {args.new}: {key}")
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Loopback benchmark suite for the PTP Sender and Receiver")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark grid")
+    run_parser.add_argument("--files", nargs="*", help=f"files to send (default: {' '.join(FILES)})")
+    run_parser.add_argument("--generate", nargs="*", default=[], metavar="SIZE", help="also send seeded random files of these sizes, e.g. 10M 1G")
+    run_parser.add_argument("--cache", help="directory for generated files, reused between runs (default: a new temporary directory)")
+    run_parser.add_argument("--max-win", nargs="+", type=int, default=[1000, 4000])
+    run_parser.add_argument("--rot", nargs="+", type=int, default=[100])
+    run_parser.add_argument("--flp", nargs="+", type=float, default=[0, 0.1])
+    run_parser.add_argument("--rlp", nargs="+", type=float, default=[0, 0.1])
+    run_parser.add_argument("--repeat", type=int, default=1, help="transfers per combination")
+    run_parser.add_argument("--seed", type=int, default=3331, help="seed of the generated files and the receiver's drops")
+    run_parser.add_argument("--timeout", type=float, default=600, help="seconds before a transfer is given up")
+    run_parser.add_argument("--sender-args", type=shlex.split, default=[], help="extra sender.py options, e.g. \"--cc cubic --mss 8000\"")
+    run_parser.add_argument("--receiver-args", type=shlex.split, default=[], help="extra receiver.py options")
+    run_parser.add_argument("--relay-args", type=shlex.split, default=None,
+                            help="put relay.py between the sender and the receiver with these options, e.g. \"--delay 20 --rate 1M\"")
+    run_parser.add_argument("-o", "--output", help="write the results as JSON")
+    run_parser.add_argument("--csv", help="write the results as CSV")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative change to flag (default: 0.1)")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
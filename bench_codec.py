@@ -0,0 +1,84 @@
+"""
+    Micro-benchmark for the segment codec
+    Python 3
+    Usage: python3 bench_codec.py [packets] [payload_size]
+    coding: utf-8
+
+    Notes:
+        Packs and unpacks packets (default 1000000) DATA segments of payload_size bytes (default 1000)
+        and prints packets per second for the old to_bytes based codec and for the struct based one,
+        both building a new datagram per packet (pack_segment) and writing into a reused buffer (pack_into).
+        The old codec is checked to produce the same bytes as the new one.
+"""
+import sys, time
+import segment
+
+# the codec used before segment.HEADER: to_bytes concatenation and sliced copies
+def legacy_pack_segment(type, seqno, data):
+    type = ((segment.VERSION << 8) | type).to_bytes(2, 'big')
+    seqno = seqno.to_bytes(4, 'big')
+    if data == None:
+        return type + seqno
+    return type + seqno + data
+
+def legacy_unpack_segment(data):
+    type = data[:2]
+    seqno = data[2:6]
+    data = data[6:]
+    type = int.from_bytes(type, 'big')
+    if type >> 8 != segment.VERSION or len(seqno) != 4:
+        raise ValueError("not a PTP version 2 segment")
+    type = type & 0xFF
+    seqno = int.from_bytes(seqno, 'big')
+    return type, seqno, data
+
+def measure(name, packets, run):
+    start = time.perf_counter()
+    run(packets)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<32}{packets / elapsed:>12,.0f} packets/s")
+
+if __name__ == '__main__':
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    payload_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    payload = b'x' * payload_size
+    buffer = bytearray(segment.HEADER_SIZE + payload_size)
+    view = memoryview(buffer)
+    datagram = segment.pack_segment(segment.DATA, 3331, payload)
+    assert legacy_pack_segment(segment.DATA, 3331, payload) == datagram
+    assert view[:segment.pack_into(buffer, segment.DATA, 3331, payload)] == datagram
+
+    def legacy_pack(n):
+        for seqno in range(n):
+            legacy_pack_segment(segment.DATA, seqno, payload)
+
+    def new_pack(n):
+        for seqno in range(n):
+            segment.pack_segment(segment.DATA, seqno, payload)
+
+    def pack_into(n):
+        for seqno in range(n):
+            segment.pack_into(buffer, segment.DATA, seqno, payload)
+
+    def header_into(n):
+        # the payload is already in place, as when the sender reads the file into the datagram
+        for seqno in range(n):
+            segment.pack_into(buffer, segment.DATA, seqno)
+
+    def legacy_unpack(n):
+        for _ in range(n):
+            legacy_unpack_segment(datagram)
+
+    def new_unpack(n):
+        for _ in range(n):
+            segment.unpack_segment(view)
+
+    print(f"{packets} segments of {payload_size} bytes")
+    print("pack")
+    measure("legacy pack_segment", packets, legacy_pack)
+    measure("pack_segment", packets, new_pack)
+    measure("pack_into (copy payload)", packets, pack_into)
+    measure("pack_into (header only)", packets, header_into)
+    print("unpack")
+    measure("legacy unpack_segment", packets, legacy_unpack)
+    measure("unpack_segment (memoryview)", packets, new_unpack)
@@ -0,0 +1,51 @@
+"""
+    Throughput sweep over the negotiated MSS
+    Python 3
+    Usage: python3 bench_mss.py [size_in_MB] [max_win] [mss ...]
+    coding: utf-8
+
+    Notes:
+        Sends a random file of size_in_MB (default 20) over loopback with sender.py and receiver.py,
+        once per mss (default 1000 2000 4000 8000 16000 32000 65000), with a window of max_win bytes
+        (default 4000000) and no loss, and prints the sender's transfer time and throughput.
+        The received file must match the one sent.
+"""
+import os, sys, time, socket, subprocess, tempfile, filecmp
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# a UDP port that is free right now
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def transfer(tmp, path, max_win, mss):
+    receiver_port, sender_port = free_port(), free_port()
+    received = os.path.join(tmp, "received.bin")
+    receiver = subprocess.Popen([sys.executable, os.path.join(HERE, "receiver.py"), str(receiver_port), str(sender_port), received, "0", "0",
+                                 "--max-buffer", str(max_win), "--rcvbuf", str(4 * 1024 * 1024)],
+                                cwd=tmp, stderr=subprocess.DEVNULL)
+    time.sleep(0.3)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(HERE, "sender.py"), str(sender_port), str(receiver_port), path, str(max_win), "100",
+                    "--mss", str(mss), "--sndbuf", str(4 * 1024 * 1024)],
+                   cwd=tmp, stderr=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+    receiver.wait()
+    return elapsed, filecmp.cmp(path, received, shallow=False)
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    max_win = int(sys.argv[2]) if len(sys.argv) > 2 else 4000000
+    sizes = [int(mss) for mss in sys.argv[3:]] or [1000, 2000, 4000, 8000, 16000, 32000, 65000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "source.bin")
+        with open(path, 'wb') as file:
+            file.write(os.urandom(size_mb * 1000000))
+        print(f"{size_mb} MB over loopback, max_win {max_win}")
+        print(f"{'mss':>8}{'time (s)':>12}{'MB/s':>10}")
+        for mss in sizes:
+            elapsed, ok = transfer(tmp, path, max_win, mss)
+            print(f"{mss:>8}{elapsed:>12.2f}{size_mb / elapsed:>10.2f}{'' if ok else '  MISMATCH'}")
@@ -0,0 +1,83 @@
+"""
+    Stress run for the receiver's reassembly path
+    Python 3
+    Usage: python3 bench_reassembly.py [size_in_MB] [reorder_window] [loss] [dup] [seed]
+    coding: utf-8
+
+    Notes:
+        Feeds a random file of size_in_MB (default 20) through Receiver.handle_segment without a socket.
+        Segments are delivered in a random order within reorder_window segments (default 16), each
+        delivery is lost with probability loss (default 0.2) and delivered again later, and duplicated
+        with probability dup (default 0.05). The output file must match the input byte for byte.
+"""
+import os, sys, time, random, tempfile, hashlib
+import segment
+import receiver
+
+MSS = 1000
+
+# a Receiver fed directly by the stress run, ACKs are only counted
+class OfflineReceiver(receiver.Receiver):
+    def create_socket(self):
+        self.acks = 0
+        return None
+
+    def transmit(self, packet, sender_address):
+        self.acks += 1
+
+# yield segment indexes in delivery order: random order within the window, lost deliveries are retried later
+def delivery_order(total_segments, window, loss, dup, rng):
+    pending = []
+    next_index = 0
+    while pending or next_index < total_segments:
+        oldest = min(pending) if pending else next_index
+        while len(pending) < window and next_index < total_segments and next_index < oldest + window:
+            pending.append(next_index)
+            next_index += 1
+        pos = rng.randrange(len(pending))
+        if rng.random() < loss:
+            continue
+        index = pending[pos]
+        if rng.random() < dup:
+            yield index
+        pending[pos] = pending[-1]
+        pending.pop()
+        yield index
+
+def stress(size_mb, window, loss, dup, seed):
+    rng = random.Random(seed)
+    data = rng.randbytes(size_mb * 1000000)
+    isn = rng.randint(0, segment.SEQ_SPACE - 1)
+    total_segments = (len(data) + MSS - 1) // MSS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out.bin")
+        rcv = OfflineReceiver(0, 0, output, 0, 0, log_file=os.devnull, max_buffer=window * MSS)
+        rcv.logging.propagate = False
+        address = ("127.0.0.1", 0)
+        start = time.perf_counter()
+        rcv.handle_segment(segment.pack_segment(segment.SYN, isn, None), address, time.time())
+        delivered = 0
+        for index in delivery_order(total_segments, window, loss, dup, rng):
+            seqno = segment.seq_add(isn, 1 + index * MSS)
+            packet = segment.pack_segment(segment.DATA, seqno, data[index * MSS:(index + 1) * MSS])
+            rcv.handle_segment(packet, address, time.time())
+            delivered += 1
+        rcv.finish()
+        elapsed = time.perf_counter() - start
+        with open(output, 'rb') as file:
+            ok = hashlib.sha256(file.read()).digest() == hashlib.sha256(data).digest()
+
+    print(f"{size_mb} MB, window {window}, loss {loss}, dup {dup}: {'OK' if ok else 'MISMATCH'}")
+    print(f"  {delivered} deliveries of {total_segments} segments in {elapsed:.2f}s "
+          f"({delivered / elapsed:.0f} segments/s), {rcv.dup_segment_received} duplicates")
+    return ok
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    loss = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    dup = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 3331
+    if not stress(size_mb, window, loss, dup, seed):
+        sys.exit(1)
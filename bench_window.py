@@ -0,0 +1,77 @@
+"""
+    Benchmark for the sender's sliding window bookkeeping
+    Python 3
+    Usage: python3 bench_window.py [size_in_MB] [max_win]
+    coding: utf-8
+
+    Notes:
+        Replays the ACK pattern of a transfer of size_in_MB (default 100) with a window of
+        max_win bytes (default 64000) against SendWindow, and prints the average cost of an ACK
+        for every tenth of the transfer. The cost should stay flat as the transfer grows.
+        The old list-based bookkeeping is replayed on a smaller transfer for comparison.
+"""
+import sys, time
+import segment
+from sender import Segment, SendWindow
+
+MSS = 1000
+
+# the bookkeeping Sender used before SendWindow: a list that is never trimmed and scanned on every ACK
+class ListWindow:
+    def __init__(self) -> None:
+        self.unack_packets = []
+
+    def append(self, packet):
+        self.unack_packets.append(packet)
+
+    def ack(self, ack_seqno):
+        for packet in self.unack_packets:
+            if packet.exp_ack == ack_seqno:
+                packet.ack_received = True
+                return True
+        return False
+
+    def oldest_unacked(self):
+        for packet in self.unack_packets:
+            if not packet.ack_received:
+                return packet
+        return None
+
+# send total_segments through the window, acking the oldest segment whenever the window is full,
+# and return the average ACK cost in microseconds for each tenth of the transfer
+def replay(window, total_segments, win_segments):
+    seqno = 0
+    in_flight = 0
+    buckets = []
+    bucket_size = max(total_segments // 10, 1)
+    bucket_time = 0.0
+    bucket_acks = 0
+    for i in range(total_segments):
+        exp_ack = segment.seq_add(seqno, MSS)
+        window.append(Segment(seqno, i * MSS, MSS, exp_ack))
+        seqno = exp_ack
+        in_flight += 1
+        if in_flight >= win_segments:
+            start = time.perf_counter()
+            window.ack(window.oldest_unacked().exp_ack)
+            bucket_time += time.perf_counter() - start
+            bucket_acks += 1
+            in_flight -= 1
+        if (i + 1) % bucket_size == 0:
+            buckets.append(bucket_time / max(bucket_acks, 1) * 1e6)
+            bucket_time = 0.0
+            bucket_acks = 0
+    return buckets
+
+def report(name, size_mb, buckets):
+    print(f"{name}: {size_mb} MB transfer, average ACK cost per tenth of the transfer (us)")
+    print("  " + "  ".join(f"{cost:.2f}" for cost in buckets))
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    max_win = int(sys.argv[2]) if len(sys.argv) > 2 else 64000
+    win_segments = max(max_win // MSS, 1)
+
+    report("SendWindow", size_mb, replay(SendWindow(), size_mb * 1000000 // MSS, win_segments))
+    legacy_mb = max(size_mb // 50, 1)
+    report("list (old)", legacy_mb, replay(ListWindow(), legacy_mb * 1000000 // MSS, win_segments))
@@ -0,0 +1,109 @@
+"""
+    Payload compression for the PTP Sender and Receiver
+    Python 3
+    coding: utf-8
+
+    Notes:
+        With --compress the sender offers OPT_COMPRESS in the SYN, a receiver that echoes it gets the
+        file as one zlib stream and decompresses it in its write path. The sender compresses the file a
+        block at a time as segments are cut and drops the compressed bytes once they are acknowledged,
+        so its memory follows the window rather than the size of the file.
+            python3 receiver.py 9000 10000 FileReceived.txt 0 0
+            python3 sender.py 10000 9000 asyoulik.txt 4000 100 --compress
+        The sender only offers it if the first SAMPLE_SIZE bytes shrink below THRESHOLD of their size,
+        otherwise the file is sent raw, as it is to a receiver that does not echo the option.
+        Sequence numbers, windows and the DATA lines of the logs count the compressed (wire) bytes,
+        the summaries and stats add the original bytes.
+"""
+import zlib, threading
+from collections import deque
+
+# zlib level, 6 is zlib's own default trade-off of speed and size
+LEVEL = 6
+# bytes of the file fed to the compressor at once, and the size of the sample that decides whether to compress
+CHUNK_SIZE = 64 * 1024
+SAMPLE_SIZE = 64 * 1024
+# compress only if the sample shrinks to less than this fraction of its size
+THRESHOLD = 0.9
+
+
+# whether the bytes of path from offset on are worth compressing
+def compressible(path, offset=0):
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        sample = file.read(SAMPLE_SIZE)
+    return len(sample) > 0 and len(zlib.compress(sample, LEVEL)) < len(sample) * THRESHOLD
+
+# the zlib stream of a buffer, compressed a chunk at a time as it is read,
+# only the compressed bytes not released yet are kept
+class CompressStream:
+    def __init__(self, view) -> None:
+        self.view = view
+        self.compressor = zlib.compressobj(LEVEL)
+        # bytes of view fed to the compressor and bytes of stream it produced so far
+        self.consumed = 0
+        self.produced = 0
+        # (stream offset, data) of the compressed chunks not released yet, in stream order
+        self.chunks = deque()
+        # the sender thread reads and fills the stream while the listener releases and rereads it
+        self.lock = threading.Lock()
+
+    # compress until the stream is at least end bytes long or the input is used up, return its length
+    def fill(self, end):
+        with self.lock:
+            while self.produced < end and self.compressor is not None:
+                if self.consumed < len(self.view):
+                    with self.view[self.consumed:self.consumed + CHUNK_SIZE] as chunk:
+                        data = self.compressor.compress(chunk)
+                        self.consumed += len(chunk)
+                else:
+                    data = self.compressor.flush()
+                    self.compressor = None
+                if data:
+                    self.chunks.append((self.produced, data))
+                    self.produced += len(data)
+            return self.produced
+
+    # length bytes of the stream from offset, they must be filled and not released
+    def read(self, offset, length):
+        end = offset + length
+        parts = []
+        with self.lock:
+            for start, data in self.chunks:
+                if start + len(data) <= offset:
+                    continue
+                if start >= end:
+                    break
+                parts.append(memoryview(data)[max(offset - start, 0):end - start])
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    # drop the chunks that end at or before offset, everything before it is acknowledged
+    def release(self, offset):
+        with self.lock:
+            while self.chunks and self.chunks[0][0] + len(self.chunks[0][1]) <= offset:
+                self.chunks.popleft()
+
+    # let go of the input view and the chunks left, the counts stay for the stats
+    def close(self):
+        with self.lock:
+            self.view.release()
+            self.chunks.clear()
+
+
+# decompress what is written to it into file, counting the bytes that come out
+class DecompressWriter:
+    def __init__(self, file) -> None:
+        self.file = file
+        self.decompressor = zlib.decompressobj()
+        self.written = 0
+
+    def write(self, data):
+        data = self.decompressor.decompress(data)
+        self.file.write(data)
+        self.written += len(data)
+
+    def close(self):
+        data = self.decompressor.flush()
+        self.file.write(data)
+        self.written += len(data)
+        self.file.close()
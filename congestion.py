@@ -0,0 +1,144 @@
+"""
+    Congestion control for the PTP Sender
+    Python 3
+    coding: utf-8
+
+    Notes:
+        The Sender keeps min(cwnd, max_win) bytes in flight and tells its CongestionControl about
+        acknowledged data, fast retransmits (3 duplicate ACKs) and retransmission timeouts:
+            NoCongestionControl  cwnd never limits the sender, only max_win does
+            Reno                 slow start, congestion avoidance, fast recovery (RFC 5681)
+            Cubic                Reno's slow start with the CUBIC window growth function (RFC 8312)
+        Pick one with create(name, mss), name being one of ALGORITHMS.
+"""
+import math
+
+# initial window, in segments (RFC 6928)
+INITIAL_WINDOW = 10
+
+
+class NoCongestionControl:
+    def __init__(self, mss) -> None:
+        self.mss = mss
+        self.cwnd = math.inf
+        self.ssthresh = math.inf
+
+    # bytes newly acknowledged outside of fast recovery, rtt is the smoothed RTT in seconds or None
+    def on_ack(self, acked_bytes, now, rtt):
+        pass
+
+    # a duplicate ACK during fast recovery
+    def on_dup_ack(self):
+        pass
+
+    # fast retransmit: 3 duplicate ACKs with flight_bytes in flight
+    def on_loss(self, flight_bytes, now):
+        pass
+
+    # the ACK that covers everything sent before fast recovery started
+    def on_recovery_exit(self):
+        pass
+
+    def on_timeout(self, flight_bytes, now):
+        pass
+
+
+class Reno(NoCongestionControl):
+    def __init__(self, mss) -> None:
+        super().__init__(mss)
+        self.cwnd = INITIAL_WINDOW * mss
+        # bytes acked since cwnd last grew in congestion avoidance
+        self.acked = 0
+
+    def on_ack(self, acked_bytes, now, rtt):
+        if self.cwnd < self.ssthresh:
+            # slow start, at most one MSS per ACK
+            self.cwnd += min(acked_bytes, self.mss)
+            return
+        # congestion avoidance, one MSS per window acknowledged
+        self.acked += acked_bytes
+        if self.acked >= self.cwnd:
+            self.acked -= self.cwnd
+            self.cwnd += self.mss
+
+    def on_dup_ack(self):
+        # every duplicate ACK means a segment left the network
+        self.cwnd += self.mss
+
+    def on_loss(self, flight_bytes, now):
+        self.ssthresh = max(flight_bytes / 2, 2 * self.mss)
+        self.cwnd = self.ssthresh + 3 * self.mss
+
+    def on_recovery_exit(self):
+        self.cwnd = self.ssthresh
+        self.acked = 0
+
+    def on_timeout(self, flight_bytes, now):
+        self.ssthresh = max(flight_bytes / 2, 2 * self.mss)
+        self.cwnd = self.mss
+        self.acked = 0
+
+
+class Cubic(Reno):
+    # scaling constant and multiplicative decrease factor of RFC 8312, windows are in segments
+    C = 0.4
+    BETA = 0.7
+
+    def __init__(self, mss) -> None:
+        super().__init__(mss)
+        # window before the last reduction, start of the current epoch and its K
+        self.w_max = 0
+        self.epoch_start = None
+        self.k = 0
+        # window of an equivalent Reno flow since the epoch started
+        self.w_est = 0
+
+    def on_ack(self, acked_bytes, now, rtt):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += min(acked_bytes, self.mss)
+            return
+        cwnd = self.cwnd / self.mss
+        if self.epoch_start is None:
+            self.epoch_start = now
+            self.w_max = max(self.w_max, cwnd)
+            self.k = math.pow(self.w_max * (1 - self.BETA) / self.C, 1 / 3)
+            self.w_est = cwnd
+        rtt = rtt or 0
+        t = now - self.epoch_start
+        target = self.C * math.pow(t + rtt - self.k, 3) + self.w_max
+        # TCP-friendly region: never grow slower than Reno would
+        self.w_est += 3 * (1 - self.BETA) / (1 + self.BETA) * (acked_bytes / self.mss) / cwnd
+        if self.w_est > target:
+            target = self.w_est
+        if target > cwnd:
+            cwnd = min(cwnd + (target - cwnd) / cwnd * (acked_bytes / self.mss), target)
+        self.cwnd = max(cwnd * self.mss, self.mss)
+
+    def on_loss(self, flight_bytes, now):
+        self.reduce()
+        self.cwnd = self.ssthresh + 3 * self.mss
+
+    def on_timeout(self, flight_bytes, now):
+        self.reduce()
+        self.cwnd = self.mss
+
+    def reduce(self):
+        cwnd = self.cwnd / self.mss
+        # fast convergence: release bandwidth when the window shrinks between two losses
+        if cwnd < self.w_max:
+            self.w_max = cwnd * (1 + self.BETA) / 2
+        else:
+            self.w_max = cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2 * self.mss)
+        self.epoch_start = None
+        self.acked = 0
+
+
+ALGORITHMS = {
+    "none": NoCongestionControl,
+    "reno": Reno,
+    "cubic": Cubic,
+}
+
+def create(name, mss):
+    return ALGORITHMS[name](mss)
@@ -0,0 +1,133 @@
+"""
+    Live metrics for the PTP Sender and Receiver
+    Python 3
+    coding: utf-8
+
+    Notes:
+        Sender.stats(), Receiver.stats() and ReceiverServer.stats() return a dict of the current
+        counters, rates, window and RTT figures and can be called at any time during a transfer.
+        With --metrics TARGET a MetricsReporter thread sends a JSON snapshot of it every
+        --metrics-interval seconds (default 1) to TARGET:
+            udp:HOST:PORT   one datagram per snapshot
+            unix:PATH       one datagram per snapshot to a UNIX datagram socket
+            anything else   a file, one JSON object per line
+        With --summary the final stats are also written as JSON next to the text log
+        (Sender_log.json, Receiver_log.json).
+        Recording only updates counters and histogram buckets on the packet path,
+        the snapshot is built by the reporter thread.
+"""
+import json, math, socket, time
+from threading import Thread, Event
+
+DEFAULT_INTERVAL = 1.0
+
+
+# latency histogram with power of two buckets in microseconds: bucket i counts values in [2**(i-1), 2**i) us
+class Histogram:
+    def __init__(self, buckets=32) -> None:
+        self.buckets = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    # value in seconds
+    def record(self, value):
+        self.buckets[min(int(value * 1e6).bit_length(), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    # upper bound of the bucket holding the q quantile, in ms
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return (1 << i) / 1000
+        return self.max * 1000
+
+    def to_dict(self):
+        ms = lambda value: None if value is None else round(value * 1000, 3)
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            # upper bound in ms -> count, empty buckets left out
+            "buckets": {str((1 << i) / 1000): n for i, n in enumerate(self.buckets) if n},
+        }
+
+# a number for JSON, infinite windows become None
+def finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+# bytes per second over elapsed seconds
+def rate(nbytes, elapsed):
+    return round(nbytes / elapsed, 1) if elapsed and elapsed > 0 else None
+
+def write_summary(path, stats):
+    with open(path, 'w') as file:
+        json.dump(stats, file, indent=2)
+        file.write("\n")
+
+
+# send stats() as JSON to target every interval seconds from a background thread
+class MetricsReporter:
+    def __init__(self, stats, target, interval=DEFAULT_INTERVAL) -> None:
+        self.stats = stats
+        self.interval = float(interval)
+        self.file = None
+        self.sock = None
+        if target.startswith("udp:"):
+            host, port = target[4:].rsplit(":", 1)
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.address = (host, int(port))
+        elif target.startswith("unix:"):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.address = target[5:]
+        else:
+            self.file = open(target, 'a')
+        self.stopped = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        snapshot = dict(self.stats(), time=time.time())
+        message = json.dumps(snapshot)
+        if self.file is not None:
+            self.file.write(message + "\n")
+            self.file.flush()
+            return
+        try:
+            self.sock.sendto(message.encode(), self.address)
+        except OSError:
+            # nobody listening, the snapshot is lost
+            pass
+
+    # send a last snapshot and release the target
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.report()
+        if self.file is not None:
+            self.file.close()
+        if self.sock is not None:
+            self.sock.close()
@@ -0,0 +1,227 @@
+"""
+    asyncio transport for the PTP Sender and Receiver
+    Python 3
+    coding: utf-8
+
+    Notes:
+        AsyncSender and AsyncReceiver reuse the protocol logic, wire format and logs of Sender and
+        Receiver, but run on asyncio.DatagramProtocol endpoints and loop timers instead of blocking
+        sockets and a listener thread, so many transfers can share one event loop:
+
+            receiver = AsyncReceiver(9000, 10000, "FileReceived.txt", 0, 0)
+            sender = AsyncSender(10000, 9000, "asyoulik.txt", 4000, 100)
+            await asyncio.gather(receiver.receive_file("FileReceived.txt"), sender.send_file("asyoulik.txt"))
+
+        Give each instance its own log_file when running several in one process.
+        The CLI entry points use these classes with --async:
+            python3 receiver.py 9000 10000 FileReceived.txt 0 0 --async
+            python3 sender.py 10000 9000 asyoulik.txt 4000 100 --async
+"""
+import asyncio
+import logging, time
+import segment
+import sender, receiver
+
+
+class SenderProtocol(asyncio.DatagramProtocol):
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    def datagram_received(self, data, addr):
+        self.owner.datagram_received(data)
+
+    def error_received(self, exc):
+        logging.debug(f"Sender transport error: {exc}")
+
+
+class ReceiverProtocol(asyncio.DatagramProtocol):
+    def __init__(self, owner) -> None:
+        self.owner = owner
+
+    def datagram_received(self, data, addr):
+        self.owner.datagram_received(data, addr)
+
+    def error_received(self, exc):
+        logging.debug(f"Receiver transport error: {exc}")
+
+
+class AsyncSender(sender.Sender):
+    def create_socket(self):
+        # the transport is created by send_file inside the running loop
+        self.transport = None
+        self.timer = None
+        self.ack_waiter = None
+        self.window_space = None
+        return None
+
+    async def send_file(self, path):
+        '''
+        Connect to the receiver, send the file at path and close the connection
+        '''
+        self.filename = path
+        loop = asyncio.get_running_loop()
+        self.window_space = asyncio.Event()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: SenderProtocol(self), local_addr=self.sender_address, remote_addr=self.receiver_address)
+        segment.set_socket_buffers(self.transport.get_extra_info('socket'), self.sndbuf, self.rcvbuf)
+        try:
+            if await self.ptp_open():
+                await self.ptp_send()
+                await self.ptp_close()
+        finally:
+            self.canceltimer()
+            self.transport.close()
+        self.log_summary()
+
+    async def ptp_open(self):
+        syn_segment = self.syn_packet()
+        for attempt in range(3):
+            self.transmit(syn_segment)
+            self.state = sender.SYN_SENT
+            self.start_time = time.time()
+            self.write_to_log(0, segment.SYN, self.curr_seqno, 0)
+            if await self.wait_for_ACK():
+                self.state = sender.ESTABLISHED
+                if attempt == 0:
+                    self.sample_rtt(time.time() - self.start_time)
+                self.rtt.reset_backoff()
+                return True
+            self.rtt.backoff()
+        self.send_reset()
+        return False
+
+    async def ptp_send(self):
+        self.open_source()
+        try:
+            while True:
+                # wait until an ACK frees space if the window is full
+                while self.window_full():
+                    self.window_space.clear()
+                    await self.window_space.wait()
+                if self.next_segment() is None:
+                    # end of file
+                    break
+            self.state = sender.CLOSING
+
+            # wait for every segment to be acknowledged
+            while self.window.oldest_unacked() is not None:
+                self.window_space.clear()
+                await self.window_space.wait()
+        finally:
+            self.canceltimer()
+            self.close_source()
+
+    async def ptp_close(self):
+        self.curr_seqno = segment.seq_add(self.curr_seqno, 1)
+        fin_segment = segment.pack_segment(segment.FIN, self.curr_seqno, None)
+        for attempt in range(3):
+            self.transmit(fin_segment)
+            self.state = sender.FIN_WAIT
+            self.write_to_log(time.time(), segment.FIN, self.curr_seqno, 0)
+            if await self.wait_for_ACK():
+                return
+        self.send_reset()
+
+    # wait up to one timeout for the ACK of our SYN or FIN
+    async def wait_for_ACK(self):
+        self.ack_waiter = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(self.ack_waiter, self.rtt.rto)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.ack_waiter = None
+
+    def datagram_received(self, incoming_message):
+        if self.state in (sender.SYN_SENT, sender.FIN_WAIT):
+            if self.ack_waiter is not None and not self.ack_waiter.done() and self.accept_ACK(incoming_message):
+                self.ack_waiter.set_result(True)
+            return
+        self.handle_ack(incoming_message)
+        # the ACK may have cancelled the earliest retransmission timer
+        self.schedule_retransmit()
+        self.window_space.set()
+
+    def transmit(self, packet):
+        self.transport.sendto(packet)
+
+    # run on_timeout at the earliest segment deadline
+    def schedule_retransmit(self):
+        self.canceltimer()
+        deadline = self.timers.next_deadline()
+        if deadline is not None:
+            loop = asyncio.get_running_loop()
+            self.timer = loop.call_at(loop.time() + max(deadline - time.time(), 0), self.on_timeout)
+
+    def wake(self):
+        self.schedule_retransmit()
+
+    def canceltimer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def on_timeout(self):
+        self.timer = None
+        self.retransmit_expired(time.time())
+        self.schedule_retransmit()
+
+
+class AsyncReceiver(receiver.Receiver):
+    def create_socket(self):
+        # the transport is created by receive_file inside the running loop
+        self.transport = None
+        self.closed = None
+        self.timer = None
+        return None
+
+    async def receive_file(self, path):
+        '''
+        Wait for a sender to connect, store the file it sends at path and return once the connection is closed
+        '''
+        self.filename = path
+        loop = asyncio.get_running_loop()
+        self.closed = loop.create_future()
+        self.state = receiver.LISTEN
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: ReceiverProtocol(self), local_addr=self.server_address)
+        segment.set_socket_buffers(self.transport.get_extra_info('socket'), self.sndbuf, self.rcvbuf)
+        try:
+            await self.closed
+        finally:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.transport.close()
+        self.finish()
+
+    def datagram_received(self, incoming_message, sender_address):
+        if self.closed.done():
+            return
+        self.handle_segment(incoming_message, sender_address, time.time())
+        self.schedule()
+
+    # run on_timer at the next delayed ACK or end of TIME_WAIT
+    def schedule(self):
+        if self.state == receiver.CLOSED:
+            self.close()
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        deadline = self.next_deadline()
+        if deadline is not None:
+            loop = asyncio.get_running_loop()
+            self.timer = loop.call_at(loop.time() + max(deadline - time.time(), 0), self.on_loop_timer)
+
+    def on_loop_timer(self):
+        self.timer = None
+        self.on_timer(time.time())
+        self.schedule()
+
+    def transmit(self, packet, sender_address):
+        self.transport.sendto(packet, sender_address)
+
+    def close(self):
+        self.state = receiver.CLOSED
+        if not self.closed.done():
+            self.closed.set_result(None)
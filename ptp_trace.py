@@ -0,0 +1,144 @@
+"""
+    Binary packet trace for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 ptp_trace.py Sender_log.trace [Sender_log.txt]
+    coding: utf-8
+
+    Notes:
+        With --trace the sender and receiver write their log as fixed-size binary records to
+        <log_file>.trace instead of formatting text on every packet:
+            python3 receiver.py 9000 10000 FileReceived.txt 0.1 0.1 --trace
+            python3 sender.py 10000 9000 asyoulik.txt 4000 100 --trace
+        Records are packed into a small pool of preallocated buffers and a writer thread writes the
+        full ones to the file, so the sending and receiving threads never wait on the disk.
+        The summary lines at the end of the log are kept as text records.
+        Running this file renders a trace into the usual snd/rcv/drp text log, line for line the
+        same as the one the text mode would have written (by default next to the trace, as .txt).
+"""
+import logging, os, queue, struct, sys
+from threading import Thread
+import segment
+
+# file header: magic and format version
+MAGIC = b'PTPTRC\x00\x01'
+# one record: time since the SYN in ms (not rounded), direction, segment type, seqno, payload length
+RECORD = struct.Struct('<dBBII')
+# directions, as in the text log, and TEXT for a line of text of length bytes that follows its record
+SND = 0
+RCV = 1
+DRP = 2
+TEXT = 255
+DIRECTIONS = {SND: "snd", RCV: "rcv", DRP: "drp"}
+NAMES = {segment.DATA: "DATA", segment.ACK: "ACK", segment.SYN: "SYN", segment.FIN: "FIN", segment.RESET: "RESET"}
+# records are collected in BUFFERS buffers of BUFFER_SIZE bytes
+BUFFER_SIZE = 64 * 1024
+BUFFERS = 4
+
+
+# a logging handler that writes the packet trace and the text lines logged through it to a binary file
+class TraceHandler(logging.Handler):
+    def __init__(self, path, buffer_size=BUFFER_SIZE, buffers=BUFFERS) -> None:
+        super().__init__()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        # empty buffers, and full ones waiting for the writer as (buffer, length)
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(bytearray(buffer_size))
+        self.full = queue.Queue()
+        self.buffer = self.free.get()
+        self.pos = 0
+        self.writer = Thread(target=self.write_buffers, daemon=True)
+        self.writer.start()
+
+    # record one segment sent, received or dropped
+    def packet(self, rel_ms, direction, type, seqno, length):
+        with self.lock:
+            if self.pos + RECORD.size > len(self.buffer):
+                self.swap()
+            RECORD.pack_into(self.buffer, self.pos, rel_ms, direction, type, seqno, length)
+            self.pos += RECORD.size
+
+    # a text line logged through the logger, called with the lock held
+    def emit(self, record):
+        text = self.format(record).encode()
+        size = RECORD.size + len(text)
+        if self.pos + size > len(self.buffer):
+            self.swap()
+        if size > len(self.buffer):
+            # too long for a buffer, hand it to the writer on its own
+            self.full.put((RECORD.pack(0, TEXT, 0, 0, len(text)) + text, size))
+            return
+        RECORD.pack_into(self.buffer, self.pos, 0, TEXT, 0, 0, len(text))
+        self.buffer[self.pos + RECORD.size:self.pos + size] = text
+        self.pos += size
+
+    # hand the current buffer to the writer, waiting for a free one only if the writer is BUFFERS behind
+    def swap(self):
+        self.full.put((self.buffer, self.pos))
+        self.buffer = self.free.get()
+        self.pos = 0
+
+    def write_buffers(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            buffer, length = item
+            with memoryview(buffer) as view:
+                self.file.write(view[:length])
+            if isinstance(buffer, bytearray):
+                self.free.put(buffer)
+
+    def flush(self):
+        with self.lock:
+            if self.pos and self.writer is not None:
+                self.swap()
+
+    def close(self):
+        with self.lock:
+            writer, self.writer = self.writer, None
+            if writer is not None:
+                if self.pos:
+                    self.full.put((self.buffer, self.pos))
+                    self.pos = 0
+                self.full.put(None)
+        if writer is not None:
+            writer.join()
+            self.file.close()
+        super().close()
+
+# the text log line of one record
+def render_packet(rel_ms, direction, type, seqno, length):
+    current_time = 0 if type == segment.SYN else round(rel_ms, 2)
+    if type == segment.RESET:
+        seqno = 0
+    if type != segment.DATA:
+        length = 0
+    return f"{DIRECTIONS[direction]}\t{current_time}\t{NAMES[type]}\t{seqno}\t{length}"
+
+# yield the text log lines of a trace file
+def render(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a PTP trace")
+    pos = len(MAGIC)
+    while pos + RECORD.size <= len(data):
+        rel_ms, direction, type, seqno, length = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        if direction == TEXT:
+            yield data[pos:pos + length].decode()
+            pos += length
+        else:
+            yield render_packet(rel_ms, direction, type, seqno, length)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python3 ptp_trace.py Sender_log.trace [Sender_log.txt]")
+        sys.exit(1)
+    path = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(path)[0] + ".txt"
+    with open(output, 'w') as file:
+        for line in render(path):
+            file.write(line + "\n")
@@ -12,6 +12,10 @@
             python3 receiver.py 9000 10000 FileReceived.txt 0 0.5
             python3 receiver.py 9000 10000 FileReceived.txt 0.5 0.5
             python3 receiver.py 56007 59606 FileToReceive.txt 0 0
+        Or serve many senders on one port, each connection gets its own output file and log:
+            python3 receiver.py 9000 10000 FileReceived.txt 0 0 --server
+        Or drop in bursts (see relay.py), or put relay.py in front to add delay and a bandwidth limit:
+            python3 receiver.py 9000 10000 FileReceived.txt ge:0.01,0.3 0
         Then run the sender:
             python3 sender.py 11000 9000 FileToReceived.txt 1000 1
             python3 sender.py 11000 9000 random1.txt 3000 1
@@ -25,14 +29,30 @@
 # here are the libs you may find it useful:
 import datetime, time  # to calculate the time delta of packet transmission
 import logging, sys  # to write the log
+import argparse
 import socket  # Core lib, to send packet via UDP socket
 from threading import Thread  # (Optional)threading will make the timer easily implemented
 import random  # for flp and rlp function
+import heapq, os
 import segment 
+import ptp_trace
+import metrics
+import relay
+import compression
 from dataclasses import dataclass
 
 BUFFERSIZE = 1024
-MAX_SEQNO = 2 ** 16 - 1
+MAX_SEQNO = segment.SEQ_SPACE - 1
+# for closing: wait 2 MSL in TIME_WAIT (seconds)
+TIME_WAIT_DELAY = 2
+# size of the write buffer in front of the output file
+WRITE_BUFFER = 64 * 1024
+# default cap on out-of-order data held in memory (bytes)
+MAX_BUFFER = 1024 * 1024
+# default delayed ACK policy: ack every ACK_EVERY in-order segments or ACK_DELAY ms after the first unacked one,
+# the delay is sent in the SYN reply and the sender adds it to its minimum RTO
+ACK_EVERY = 1
+ACK_DELAY = 40
 # receiver state
 CLOSED = 0
 LISTEN = 1
@@ -45,16 +65,57 @@ class Buffer_obj:
     seqno: int
     exp_next_seqno: int
     data: bytes
+    arrival: float = 0.0
     
+# writes a connection's range of a file other connections write too, in place and without truncating it
+class RangeWriter:
+    def __init__(self, path, offset) -> None:
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        self.offset = offset
+        self.pending = bytearray()
+
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= WRITE_BUFFER:
+            self.flush()
+
+    def flush(self):
+        view = memoryview(self.pending)
+        while view:
+            written = os.pwrite(self.fd, view, self.offset)
+            self.offset += written
+            view = view[written:]
+        view.release()
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        os.close(self.fd)
+
 class Receiver:
-    def __init__(self, receiver_port: int, sender_port: int, filename: str, flp: float, rlp: float) -> None:
+    def __init__(self, receiver_port: int, sender_port: int, filename: str, flp: float, rlp: float, log_file: str = "Receiver_log.txt", max_buffer: int = MAX_BUFFER,
+                 ack_every: int = ACK_EVERY, ack_delay: int = ACK_DELAY, mss: int = segment.MAX_MSS, sndbuf: int = None, rcvbuf: int = None,
+                 trace: bool = False, metrics_target: str = None, metrics_interval: float = metrics.DEFAULT_INTERVAL, summary: bool = False) -> None:
         '''
         The server will be able to receive the file from the sender via UDP
         :param receiver_port: the UDP port number to be used by the receiver to receive PTP segments from the sender.
         :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver.
         :param filename: the name of the text file into which the text sent by the sender should be stored
         :param flp: forward loss probability, which is the probability that any segment in the forward direction (Data, FIN, SYN) is lost.
+            Also takes a burst loss model "ge:P,R[,H[,K]]", see relay.loss_model.
         :param rlp: reverse loss probability, which is the probability of a segment in the reverse direction (i.e., ACKs) being lost.
+            Also takes a burst loss model, as flp.
+        :param log_file: the file the receiver log is written to.
+        :param max_buffer: the most out-of-order data (in bytes) held in memory, segments beyond it are dropped and not acknowledged.
+        :param ack_every: acknowledge every ack_every in-order segments, 1 acknowledges each one.
+        :param ack_delay: the most time (in milliseconds) an in-order segment waits for its ACK. Out-of-order segments, SYN and FIN are acknowledged at once.
+        :param mss: the largest payload accepted in the SYN exchange, a sender offering more is told to use this.
+        :param sndbuf: if given, the SO_SNDBUF size of the socket in bytes.
+        :param rcvbuf: if given, the SO_RCVBUF size of the socket in bytes.
+        :param trace: write the log as a binary trace to log_file with the extension .trace, see ptp_trace.
+        :param metrics_target: if given, where a JSON snapshot of stats() is sent every metrics_interval seconds, see metrics.
+        :param metrics_interval: seconds between two snapshots.
+        :param summary: also write the final stats as JSON to log_file with the extension .json.
 
         '''
         self.address = "127.0.0.1"  # change it to 0.0.0.0 or public ipv4 address if want to test it between different computers
@@ -64,134 +125,371 @@ class Receiver:
 
         # init the UDP socket
         # define socket for the server side and bind address
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
         logging.debug(f"The sender is using the address {self.server_address} to receive message!")
-        self.receiver_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-        self.receiver_socket.bind(self.server_address)
+        self.receiver_socket = self.create_socket()
         
         # init variables 
         self.state = CLOSED
         self.filename = filename
-        self.flp = float(flp)
-        self.rlp = float(rlp)
+        self.flp = flp
+        self.rlp = rlp
+        # the drops are the Bernoulli or Gilbert-Elliott profile of the relay's links, applied here without delay
+        self.forward_loss = relay.loss_model(flp)
+        self.reverse_loss = relay.loss_model(rlp)
         self.isn = None
-        # for storing all the bytes received
-        self.buffer = []
+        # in-order data is written to the file as soon as it arrives, next_seqno is the next byte expected
+        self.file = None
+        self.next_seqno = None
+        # bytes written in order so far, counted rather than derived from next_seqno which wraps
+        self.delivered_bytes = 0
+        # out-of-order segments waiting for the gap before them, keyed by seqno
+        self.buffer = {}
+        self.buffered_bytes = 0
+        # the buffered data as SACK ranges, start -> end and end -> start, merged as segments arrive
+        self.sack_permitted = False
+        self.range_end = {}
+        self.range_start = {}
+        self.last_range = None
+        self.max_buffer = int(max_buffer)
+        self.mss = max(min(int(mss), segment.MAX_MSS), 1)
+        # delayed ACKs: in-order segments not acknowledged yet and when the ACK for them is due
+        self.ack_every = max(int(ack_every), 1)
+        self.ack_delay = int(ack_delay) / 1000
+        self.pending_acks = 0
+        self.ack_deadline = None
+        self.peer_address = None
+        # when TIME_WAIT ends, None while the connection is open
+        self.time_wait_deadline = None
         
         # 9. create log file
         # create a logger object
-        self.logging = logging.getLogger(__name__)
-        self.handler = logging.FileHandler("Receiver_log.txt", mode = 'w')
+        # one logger per log file so several receivers can run in one process
+        self.logging = logging.getLogger(f"{__name__}.{log_file}")
+        if trace:
+            self.handler = self.trace = ptp_trace.TraceHandler(os.path.splitext(log_file)[0] + ".trace")
+        else:
+            self.handler = logging.FileHandler(log_file, mode = 'w')
+            self.trace = None
         self.formatter = logging.Formatter('%(message)s')
         self.handler.setFormatter(self.formatter)
         self.logging.addHandler(self.handler)
         self.logging.setLevel(logging.INFO)
         self.start_time = None
+        # when the FIN or RESET arrived, the stats do not count the TIME_WAIT that follows
+        self.end_time = None
         self.total_data_received = 0
         self.total_segment_received = 0
         self.dup_segment_received = 0
         self.dropped_data_segment = 0
         self.dropped_ack_segment = 0
+        # deepest the reorder buffer got, and how long out-of-order segments waited for the gap before them
+        self.max_reorder_depth = 0
+        self.reorder_histogram = metrics.Histogram()
+        self.summary_file = os.path.splitext(log_file)[0] + ".json" if summary else None
+        self.reporter = metrics.MetricsReporter(self.stats, metrics_target, metrics_interval) if metrics_target else None
+        # ACKs are built in one reused buffer
+        self.send_buffer = bytearray(BUFFERSIZE)
+        self.send_view = memoryview(self.send_buffer)
         pass
 
+    def create_socket(self):
+        receiver_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        segment.set_socket_buffers(receiver_socket, self.sndbuf, self.rcvbuf)
+        receiver_socket.bind(self.server_address)
+        return receiver_socket
+
     def run(self) -> None:
         '''
         This function contain the main logic of the receiver
         '''
         self.state = LISTEN
+        # every segment is received into one buffer that fits the largest mss we accept
+        recv_buffer = bytearray(segment.HEADER_SIZE + self.mss)
+        recv_view = memoryview(recv_buffer)
         # start receive data:
         while True:
-            if self.state == TIME_WAIT:
-                # for closing: wait 2 MSL
-                self.receiver_socket.settimeout(2)      
+            # wait for a segment until the next delayed ACK or the end of TIME_WAIT
+            deadline = self.next_deadline()
+            if deadline is None:
+                self.receiver_socket.settimeout(None)
+            else:
+                self.receiver_socket.settimeout(max(deadline - time.time(), 0.001))
             try:
                 # try to receive any incoming message from the sender
-                incoming_message, sender_address = self.receiver_socket.recvfrom(BUFFERSIZE)
+                nbytes, sender_address = self.receiver_socket.recvfrom_into(recv_buffer)
                 curr_time = time.time()
-            except:
+                self.handle_segment(recv_view[:nbytes], sender_address, curr_time)
+            except socket.timeout:
+                self.on_timer(time.time())
+            except OSError:
                 # for closing socket
                 self.state = CLOSED 
+            if self.state == CLOSED:
+                # close socket
                 self.receiver_socket.close()
                 break
+            
+        self.finish()
+        return
+
+    # process one segment from the sender and reply with an ACK
+    def handle_segment(self, incoming_message, sender_address, curr_time):
+        try:
             segment_type, segment_seqno, data = segment.unpack_segment(incoming_message)
-            if segment_type == segment.SYN:
-                self.start_time = curr_time
-            # Simulate packet loss for any segment in the forward direction
-            if segment_type != segment.RESET and random.random() < self.flp:
-                if segment_type == segment.DATA:
-                    self.dropped_data_segment += 1
-                self.drp_log(curr_time, segment_type, segment_seqno, len(data))
-                continue
+        except ValueError:
+            # not a segment we understand
+            return
+        reply_data = None
+        self.peer_address = sender_address
+        if self.state == TIME_WAIT:
+            # for closing: wait 2 MSL after the last segment
+            self.time_wait_deadline = curr_time + TIME_WAIT_DELAY
+        if segment_type == segment.SYN:
+            self.start_time = curr_time
+        # Simulate packet loss for any segment in the forward direction
+        if segment_type != segment.RESET and self.forward_loss.drop():
+            if segment_type == segment.DATA:
+                self.dropped_data_segment += 1
+            self.drp_log(curr_time, segment_type, segment_seqno, len(data))
+            return
 
-            self.write_to_log(curr_time, segment_type, segment_seqno, len(data)) 
-            
-            if segment_type == segment.SYN:
-                self.state = ESTABLISHED
+        self.write_to_log(curr_time, segment_type, segment_seqno, len(data)) 
+        
+        if segment_type == segment.SYN:
+            self.state = ESTABLISHED
+            # a retransmitted SYN must not truncate what was already written
+            options = segment.unpack_options(data)
+            if self.file is None:
                 self.isn = segment_seqno
-                segment_seqno += 1
-            elif segment_type == segment.DATA:
-                # creat buffer object and append to buffer
-                self.append_to_buffer(Buffer_obj(segment_seqno, (segment_seqno + len(data)) % (2 ** 16), data))
-                segment_seqno += len(data)
-            elif segment_type == segment.FIN:    
-                segment_seqno += 1
-                self.state = TIME_WAIT
-            elif segment_type == segment.RESET:
-                # close socket
-                self.state = CLOSED 
-                self.receiver_socket.close()
+                self.next_seqno = segment.seq_add(segment_seqno, 1)
+                self.file = self.open_file(options)
+            reply_data = self.syn_options(options)
+            segment_seqno += 1
+        elif segment_type == segment.DATA:
+            if self.next_seqno is None:
+                # no connection yet
+                return
+            # only data that simply extends the in-order stream may wait for a delayed ACK
+            in_order = segment_seqno == self.next_seqno and not self.buffer
+            # creat buffer object and append to buffer, a packet with no room is dropped and the sender will retransmit it
+            self.append_to_buffer(Buffer_obj(segment_seqno, segment.seq_add(segment_seqno, len(data)), data, curr_time))
+            if in_order:
+                self.pending_acks += 1
+                if self.pending_acks < self.ack_every:
+                    if self.ack_deadline is None:
+                        self.ack_deadline = curr_time + self.ack_delay
+                    return
+            self.send_ack(sender_address)
+            return
+        elif segment_type == segment.FIN:    
+            segment_seqno += 1
+            if self.end_time is None:
+                self.end_time = curr_time
+            self.state = TIME_WAIT
+            self.time_wait_deadline = curr_time + TIME_WAIT_DELAY
+        elif segment_type == segment.RESET:
+            self.end_time = curr_time
+            self.state = CLOSED 
+            return
+        
+        self.send_ack(sender_address, segment_seqno % segment.SEQ_SPACE, reply_data)
+
+    # reply "ACK", by default the cumulative ack of everything received in order plus the ranges held above the gap
+    def send_ack(self, sender_address, ack_seqno=None, reply_data=None):
+        blocks = ()
+        if ack_seqno is None:
+            ack_seqno = self.next_seqno
+            if self.sack_permitted and self.range_end:
+                blocks = self.sack_blocks()
+        # this ACK covers every pending in-order segment
+        self.pending_acks = 0
+        self.ack_deadline = None
+        
+        # Simulate packet loss for any segment in the reverse direction
+        if self.reverse_loss.drop():
+            self.dropped_ack_segment += 1
+            self.drp_log(time.time(), segment.ACK, ack_seqno, 0)
+            return
+        
+        length = segment.pack_into(self.send_buffer, segment.ACK, ack_seqno, reply_data)
+        length = segment.pack_sack_into(self.send_buffer, length, blocks)
+        self.transmit(self.send_view[:length], sender_address)
+        self.write_to_log(time.time(), segment.ACK, ack_seqno, 0)
+
+    # the next time on_timer has work to do, None if there is no timer running
+    def next_deadline(self):
+        deadlines = [deadline for deadline in (self.ack_deadline, self.time_wait_deadline) if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    # send a delayed ACK that is due and end TIME_WAIT once it has passed
+    def on_timer(self, now):
+        if self.ack_deadline is not None and self.ack_deadline <= now:
+            self.send_ack(self.peer_address)
+        if self.time_wait_deadline is not None and self.time_wait_deadline <= now:
+            self.state = CLOSED
+
+    # options for the ACK of a SYN: accept the sender's window up to what we can hold out of order,
+    # its mss up to ours, and SACK if offered
+    def syn_options(self, options):
+        window = self.max_buffer
+        if segment.OPT_WINDOW in options:
+            window = min(window, segment.unpack_window(options[segment.OPT_WINDOW]))
+        reply = {segment.OPT_WINDOW: segment.pack_window(window)}
+        if segment.OPT_MSS in options:
+            reply[segment.OPT_MSS] = segment.pack_mss(min(self.mss, segment.unpack_mss(options[segment.OPT_MSS])))
+        self.sack_permitted = segment.OPT_SACK_PERMITTED in options
+        if self.sack_permitted:
+            reply[segment.OPT_SACK_PERMITTED] = b''
+        if segment.OPT_OFFSET in options:
+            reply[segment.OPT_OFFSET] = options[segment.OPT_OFFSET]
+        if options.get(segment.OPT_COMPRESS) == segment.COMPRESS_ZLIB:
+            reply[segment.OPT_COMPRESS] = segment.COMPRESS_ZLIB
+        # an ACK held back must not look lost, the sender keeps its RTO above this delay
+        if self.ack_every > 1:
+            reply[segment.OPT_ACK_DELAY] = segment.pack_ack_delay(round(self.ack_delay * 1000))
+        return segment.pack_options(reply)
+
+    # the output file, a sender that gives an offset shares it with other connections and only writes its own range,
+    # a compressed stream is decompressed on its way to the file
+    def open_file(self, options):
+        if segment.OPT_OFFSET in options:
+            file = RangeWriter(self.filename, segment.unpack_offset(options[segment.OPT_OFFSET]))
+        else:
+            file = open(self.filename, 'wb', buffering=WRITE_BUFFER)
+        if options.get(segment.OPT_COMPRESS) == segment.COMPRESS_ZLIB:
+            file = compression.DecompressWriter(file)
+        return file
+
+    # SACK blocks for the next ACK: the range that changed last first, then the others from the lowest up
+    def sack_blocks(self):
+        blocks = []
+        if self.last_range in self.range_end:
+            blocks.append((self.last_range, self.range_end[self.last_range]))
+        for start in sorted(self.range_end, key=lambda start: segment.seq_diff(start, self.next_seqno)):
+            if len(blocks) >= segment.MAX_SACK_BLOCKS:
                 break
-            
-            segment_seqno = segment_seqno % (2 ** 16)
-            
-            # Simulate packet loss for any segment in the reverse direction
-            if random.random() < self.rlp:
-                self.dropped_ack_segment += 1
-                self.drp_log(time.time(), segment.ACK, segment_seqno, 0)
-                continue
-            
-            # reply "ACK" once receive any message from sender
-            reply_message = segment.pack_segment(segment.ACK, segment_seqno, None)
-            self.receiver_socket.sendto(reply_message, sender_address)
-            self.write_to_log(time.time(), segment.ACK, segment_seqno, 0)
-            
-        # write from buffer to txt file
-        self.write_to_txt()
+            if start != self.last_range:
+                blocks.append((start, self.range_end[start]))
+        return blocks
+
+    # merge a newly buffered segment into the SACK ranges
+    def add_sack_range(self, start, end):
+        if end in self.range_end:
+            new_end = self.range_end.pop(end)
+            del self.range_start[new_end]
+            end = new_end
+        if start in self.range_start:
+            new_start = self.range_start.pop(start)
+            del self.range_end[new_start]
+            start = new_start
+        self.range_end[start] = end
+        self.range_start[end] = start
+        self.last_range = start
+
+    def transmit(self, packet, sender_address):
+        self.receiver_socket.sendto(packet, sender_address)
+
+    # write the received file and the summary once the connection is closed
+    def finish(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+        # flush the buffered writes, the file is created even if nothing was received
+        if self.file is None:
+            self.file = open(self.filename, 'wb')
+        self.file.close()
         self.logging.info(f"Amount of (original) Data Received (in bytes) - does not include retransmitted data: {self.total_data_received}")
+        if isinstance(self.file, compression.DecompressWriter):
+            self.logging.info(f"Amount of Data after decompression (in bytes): {self.file.written}")
         self.logging.info(f"Number of (original) Data Segments Received: {self.total_segment_received}")
         self.logging.info(f"Number of duplicate Data Segments Received: {self.dup_segment_received}")
         self.logging.info(f"Number of Data segments dropped: {self.dropped_data_segment}")
         self.logging.info(f"Number of ACK segments dropped: {self.dropped_ack_segment}")
+        if self.reporter is not None:
+            self.reporter.stop()
+        if self.summary_file is not None:
+            metrics.write_summary(self.summary_file, self.stats())
+        self.logging.removeHandler(self.handler)
+        self.handler.close()
+
+    # counters, rates and reorder buffer of the connection so far, safe to call from any thread while it runs
+    def stats(self):
+        elapsed = None if self.start_time is None else (self.end_time or time.time()) - self.start_time
+        delivered = self.delivered_bytes
+        # bytes written to the file, the delivered ones once decompressed
+        compressed = isinstance(self.file, compression.DecompressWriter)
+        written = self.file.written if compressed else delivered
+        return {
+            "role": "receiver",
+            "state": self.state,
+            "elapsed": elapsed,
+            "bytes_received": self.total_data_received,
+            "bytes_delivered": delivered,
+            "compressed": compressed,
+            "bytes_written": written,
+            "segments_received": self.total_segment_received,
+            "duplicates": self.dup_segment_received,
+            "dropped_data": self.dropped_data_segment,
+            "dropped_acks": self.dropped_ack_segment,
+            # bytes per second of data written to the file in order
+            "goodput": metrics.rate(delivered, elapsed),
+            "original_goodput": metrics.rate(written, elapsed),
+            "reorder": {
+                "segments": len(self.buffer),
+                "bytes": self.buffered_bytes,
+                "sack_ranges": len(self.range_end),
+                "max_segments": self.max_reorder_depth,
+                "wait_histogram": self.reorder_histogram.to_dict(),
+            },
+        }
         
-        return
-        
-    # helper function: write all the bytes in buffer to file    
-    def write_to_txt(self):
-        with open(self.filename, 'wb') as file:
-            for item in self.buffer:
-                file.write(item.data)
-    
-    # helper function: add received packets to buffer in the right order, ignore duplicate packets 
+    # helper function: write in-order packets straight to the file and keep out-of-order packets until the gap
+    # before them is filled, ignore duplicate packets, return False if the packet could not be held
     def append_to_buffer(self, packet):
-        # if buffer empty or seqno equal or larger than the last element exp_seqno, append
+        if self.next_seqno is None:
+            return False
         seqno = packet.seqno
-        for item in self.buffer:
-            if item.seqno == seqno:
-                self.dup_segment_received += 1
-                return
+        # anything behind the next expected byte is already in the file
+        if segment.seq_lt(seqno, self.next_seqno) or seqno in self.buffer:
+            self.dup_segment_received += 1
+            return True
+        if seqno != self.next_seqno and self.buffered_bytes + len(packet.data) > self.max_buffer:
+            return False
         
         # for logging
         self.total_segment_received += 1
         self.total_data_received += len(packet.data)
         
-        if not self.buffer or seqno >= self.buffer[-1].exp_next_seqno:
-            self.buffer.append(packet)
-        elif seqno < self.buffer[-1].exp_next_seqno:
-            for i, item in enumerate(self.buffer):
-                if item.exp_next_seqno == seqno:
-                    self.buffer.insert(i, packet)
-        return
+        if seqno != self.next_seqno:
+            # the data may be a view of the receive buffer, keep a copy
+            packet.data = bytes(packet.data)
+            self.buffer[seqno] = packet
+            self.buffered_bytes += len(packet.data)
+            self.max_reorder_depth = max(self.max_reorder_depth, len(self.buffer))
+            self.add_sack_range(seqno, packet.exp_next_seqno)
+            return True
+        
+        self.file.write(packet.data)
+        self.delivered_bytes += len(packet.data)
+        self.next_seqno = packet.exp_next_seqno
+        # the range right after this packet is now in order and is written out below
+        if self.next_seqno in self.range_end:
+            del self.range_start[self.range_end.pop(self.next_seqno)]
+        # write out the buffered packets that are now in order
+        while self.next_seqno in self.buffer:
+            item = self.buffer.pop(self.next_seqno)
+            self.buffered_bytes -= len(item.data)
+            self.reorder_histogram.record(packet.arrival - item.arrival)
+            self.file.write(item.data)
+            self.delivered_bytes += len(item.data)
+            self.next_seqno = item.exp_next_seqno
+        return True
     
     def write_to_log(self, curr_time, type, seqno, len):
+        if self.trace is not None:
+            self.trace.packet((curr_time - self.start_time) * 1000, ptp_trace.SND if type == segment.ACK else ptp_trace.RCV, type, seqno, len)
+            return
         current_time = round((curr_time - self.start_time) * 1000, 2)
         if type == segment.SYN:
             self.logging.info(f"rcv\t0\tSYN\t{seqno}\t0")
@@ -205,6 +503,10 @@ class Receiver:
             self.logging.info(f"rcv\t{current_time}\tRESET\t0\t0")
     
     def drp_log(self, curr_time, type, seqno, len):
+        if self.trace is not None:
+            if type != segment.RESET:
+                self.trace.packet((curr_time - self.start_time) * 1000, ptp_trace.DRP, type, seqno, len)
+            return
         current_time = round((curr_time - self.start_time) * 1000, 2)
         if type == segment.SYN:
             self.logging.info(f"drp\t0\tSYN\t{seqno}\t0")
@@ -215,6 +517,161 @@ class Receiver:
         elif type == segment.FIN:
             self.logging.info(f"drp\t{current_time}\tFIN\t{seqno}\t0")            
 
+# one connection served by a ReceiverServer, it shares the server socket instead of binding its own
+class FlowReceiver(Receiver):
+    def __init__(self, server, sender_address, isn, filename: str, log_file: str) -> None:
+        self.server = server
+        self.sender_address = sender_address
+        super().__init__(server.receiver_port, sender_address[1], filename, server.flp, server.rlp, log_file, server.max_buffer,
+                         server.ack_every, server.ack_delay, server.mss, trace=server.trace, summary=server.summary)
+        self.state = LISTEN
+        self.isn = isn
+
+    def create_socket(self):
+        return None
+
+    def transmit(self, packet, sender_address):
+        self.server.transmit(packet, sender_address)
+
+class ReceiverServer:
+    def __init__(self, receiver_port: int, sender_port: int, filename: str, flp: float, rlp: float, max_flows: int = None, max_buffer: int = MAX_BUFFER,
+                 ack_every: int = ACK_EVERY, ack_delay: int = ACK_DELAY, mss: int = segment.MAX_MSS, sndbuf: int = None, rcvbuf: int = None,
+                 trace: bool = False, metrics_target: str = None, metrics_interval: float = metrics.DEFAULT_INTERVAL, summary: bool = False) -> None:
+        '''
+        Server mode: receive files from many senders at once on one UDP port
+        :param receiver_port: the UDP port number to be used by the receiver to receive PTP segments from the senders.
+        :param sender_port: unused, kept so the arguments match Receiver.
+        :param filename: name template for the received files, each connection writes to its own copy named after the sender address and ISN.
+        :param flp: forward loss probability applied to every connection.
+        :param rlp: reverse loss probability applied to every connection.
+        :param max_flows: stop after this many connections have closed, None to run forever.
+        :param max_buffer: the most out-of-order data (in bytes) each connection holds in memory.
+        :param ack_every: delayed ACK policy of each connection, see Receiver.
+        :param ack_delay: delayed ACK timeout of each connection in milliseconds, see Receiver.
+        :param mss: the largest payload accepted from each connection, see Receiver.
+        :param sndbuf: if given, the SO_SNDBUF size of the server socket in bytes.
+        :param rcvbuf: if given, the SO_RCVBUF size of the server socket in bytes.
+        :param trace: write each connection's log as a binary trace, see Receiver.
+        :param metrics_target: if given, where a JSON snapshot of stats(), covering every open connection, is sent every metrics_interval seconds.
+        :param metrics_interval: seconds between two snapshots.
+        :param summary: write each connection's final stats as JSON next to its log, see Receiver.
+        '''
+        self.address = "127.0.0.1"
+        self.receiver_port = int(receiver_port)
+        self.server_address = (self.address, self.receiver_port)
+        self.filename = filename
+        self.flp = flp
+        self.rlp = rlp
+        self.max_flows = max_flows
+        self.max_buffer = max_buffer
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        self.mss = max(min(int(mss), segment.MAX_MSS), 1)
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.trace = trace
+        self.summary = summary
+        self.closed_flows = 0
+
+        logging.debug(f"The server is using the address {self.server_address} to receive message!")
+        self.server_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        segment.set_socket_buffers(self.server_socket, sndbuf, rcvbuf)
+        self.server_socket.bind(self.server_address)
+
+        # open connections keyed by sender address, each remembers the ISN of its SYN
+        self.flows = {}
+        self.recv_buffer = bytearray(segment.HEADER_SIZE + self.mss)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.reporter = metrics.MetricsReporter(self.stats, metrics_target, metrics_interval) if metrics_target else None
+        # (deadline, sender address) of connection timers (delayed ACK, TIME_WAIT), stale entries are skipped when popped
+        self.deadlines = []
+
+    def run(self) -> None:
+        while True:
+            self.expire_flows(time.time())
+            if self.max_flows is not None and self.closed_flows >= self.max_flows:
+                break
+            if self.deadlines:
+                self.server_socket.settimeout(max(self.deadlines[0][0] - time.time(), 0.001))
+            else:
+                self.server_socket.settimeout(None)
+            try:
+                nbytes, sender_address = self.server_socket.recvfrom_into(self.recv_buffer)
+            except socket.timeout:
+                continue
+            self.dispatch(self.recv_view[:nbytes], sender_address, time.time())
+        self.close()
+
+    # hand a segment to the connection of its sender, a SYN with a new ISN starts a new connection
+    def dispatch(self, incoming_message, sender_address, curr_time):
+        try:
+            segment_type, segment_seqno, data = segment.unpack_segment(incoming_message)
+        except ValueError:
+            return
+        flow = self.flows.get(sender_address)
+        if segment_type == segment.SYN and (flow is None or flow.isn != segment_seqno):
+            if flow is not None:
+                self.close_flow(flow)
+            flow = self.open_flow(sender_address, segment_seqno)
+        if flow is None:
+            return
+        flow.handle_segment(incoming_message, sender_address, curr_time)
+        if flow.state == CLOSED:
+            self.close_flow(flow)
+        else:
+            self.schedule(flow)
+
+    def schedule(self, flow):
+        deadline = flow.next_deadline()
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, flow.sender_address))
+
+    def open_flow(self, sender_address, isn):
+        host, port = sender_address
+        name, ext = os.path.splitext(self.filename)
+        flow = FlowReceiver(self, sender_address, isn, f"{name}-{host}-{port}-{isn}{ext}", f"Receiver_log-{host}-{port}-{isn}.txt")
+        self.flows[sender_address] = flow
+        return flow
+
+    def close_flow(self, flow):
+        if self.flows.get(flow.sender_address) is flow:
+            del self.flows[flow.sender_address]
+        flow.state = CLOSED
+        flow.finish()
+        self.closed_flows += 1
+
+    # run the connection timers that are due, closing connections whose TIME_WAIT has ended
+    def expire_flows(self, now):
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, sender_address = heapq.heappop(self.deadlines)
+            flow = self.flows.get(sender_address)
+            if flow is None or flow.next_deadline() != deadline:
+                continue
+            flow.on_timer(now)
+            if flow.state == CLOSED:
+                self.close_flow(flow)
+            else:
+                self.schedule(flow)
+
+    def transmit(self, packet, sender_address):
+        self.server_socket.sendto(packet, sender_address)
+
+    def stats(self):
+        return {
+            "role": "server",
+            "open_flows": len(self.flows),
+            "closed_flows": self.closed_flows,
+            "flows": {f"{host}:{port}": flow.stats() for (host, port), flow in list(self.flows.items())},
+        }
+
+    # finish any connection still open and release the port
+    def close(self):
+        for flow in list(self.flows.values()):
+            self.close_flow(flow)
+        if self.reporter is not None:
+            self.reporter.stop()
+        self.server_socket.close()
+
 if __name__ == '__main__':
     # logging is useful for the log part: https://docs.python.org/3/library/logging.html
     logging.basicConfig(
@@ -224,10 +681,46 @@ if __name__ == '__main__':
         format='%(asctime)s,%(msecs)03d %(levelname)-8s %(message)s',
         datefmt='%Y-%m-%d:%H:%M:%S')
 
-    if len(sys.argv) != 6:
-        print(
-            "\n===== Error usage, python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp ======\n")
-        exit(0)
+    parser = argparse.ArgumentParser(usage="python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp [options]")
+    parser.add_argument("receiver_port", type=int)
+    parser.add_argument("sender_port", type=int)
+    parser.add_argument("filename")
+    parser.add_argument("flp", help="forward loss probability, or ge:P,R[,H[,K]] for burst loss, see relay.py")
+    parser.add_argument("rlp", help="reverse loss probability, or ge:P,R[,H[,K]] for burst loss, see relay.py")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run the receiver on asyncio")
+    parser.add_argument("--server", action="store_true", help="serve many senders on receiver_port, each connection writes its own file and log")
+    parser.add_argument("--max-flows", type=int, default=None, help="in server mode, exit after this many connections have closed")
+    parser.add_argument("--max-buffer", type=int, default=MAX_BUFFER, help="most out-of-order data held in memory per connection, in bytes")
+    parser.add_argument("--ack-every", type=int, default=ACK_EVERY, help="acknowledge every N in-order segments")
+    parser.add_argument("--ack-delay", type=int, default=ACK_DELAY, help="most time an in-order segment waits for its ACK, in milliseconds")
+    parser.add_argument("--mss", type=int, default=segment.MAX_MSS, help=f"largest payload to accept in the SYN exchange (default: {segment.MAX_MSS})")
+    parser.add_argument("--sndbuf", type=int, default=None, help="SO_SNDBUF size of the socket in bytes")
+    parser.add_argument("--rcvbuf", type=int, default=None, help="SO_RCVBUF size of the socket in bytes")
+    parser.add_argument("--trace", action="store_true", help="write a binary trace to Receiver_log.trace instead of Receiver_log.txt, render it with ptp_trace.py")
+    parser.add_argument("--metrics", metavar="TARGET", help="send JSON stats snapshots to TARGET: udp:HOST:PORT, unix:PATH or a file")
+    parser.add_argument("--metrics-interval", type=float, default=metrics.DEFAULT_INTERVAL, help="seconds between two stats snapshots (default: 1)")
+    parser.add_argument("--summary", action="store_true", help="also write the final stats as JSON to Receiver_log.json")
+    parser.add_argument("--seed", type=int, default=None, help="seed the flp/rlp drops so a run can be repeated")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
 
-    receiver = Receiver(*sys.argv[1:])    
-    receiver.run()
+    if args.server:
+        server = ReceiverServer(args.receiver_port, args.sender_port, args.filename, args.flp, args.rlp, args.max_flows, args.max_buffer,
+                                args.ack_every, args.ack_delay, args.mss, args.sndbuf, args.rcvbuf, args.trace,
+                                args.metrics, args.metrics_interval, args.summary)
+        try:
+            server.run()
+        except KeyboardInterrupt:
+            server.close()
+    elif args.use_async:
+        import asyncio, ptp_async
+        receiver = ptp_async.AsyncReceiver(args.receiver_port, args.sender_port, args.filename, args.flp, args.rlp, max_buffer=args.max_buffer,
+                                              ack_every=args.ack_every, ack_delay=args.ack_delay, mss=args.mss, sndbuf=args.sndbuf, rcvbuf=args.rcvbuf,
+                                              trace=args.trace, metrics_target=args.metrics, metrics_interval=args.metrics_interval, summary=args.summary)
+        asyncio.run(receiver.receive_file(args.filename))
+    else:
+        receiver = Receiver(args.receiver_port, args.sender_port, args.filename, args.flp, args.rlp, max_buffer=args.max_buffer,
+                            ack_every=args.ack_every, ack_delay=args.ack_delay, mss=args.mss, sndbuf=args.sndbuf, rcvbuf=args.rcvbuf,
+                            trace=args.trace, metrics_target=args.metrics, metrics_interval=args.metrics_interval, summary=args.summary)
+        receiver.run()
@@ -0,0 +1,262 @@
+"""
+    Network impairment emulator for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 relay.py relay_port receiver_port [options]
+    coding: utf-8
+
+    Notes:
+        A UDP relay that stands in for a WAN between the sender and the receiver. The sender sends
+        to relay_port instead of the receiver, the relay forwards every segment to receiver_port
+        and every reply back to the sender, each direction through its own impaired link:
+            python3 receiver.py 9000 10000 FileReceived.txt 0 0
+            python3 relay.py 9001 9000 --delay 40 --jitter 5 --rate 1M --queue 64K --loss ge:0.01,0.3
+            python3 sender.py 10000 9001 asyoulik.txt 64000 200
+        Every option takes one value for both directions or FORWARD/REVERSE, e.g. --loss 0.1/0:
+            --delay MS          one-way delay
+            --jitter MS         uniform random delay added on top, 0 to MS
+            --rate BYTES        bytes per second the link sends, segments wait in a queue for it
+            --queue BYTES       most bytes waiting in that queue, more are dropped (tail drop)
+            --reorder P         probability a segment is held back --reorder-gap ms so later ones overtake it
+            --duplicate P       probability a segment is delivered twice
+            --loss MODEL        P drops every segment with probability P (what flp and rlp of the
+                                receiver do), ge:P,R[,H[,K]] is Gilbert-Elliott burst loss: the link
+                                goes bad with probability P and good again with probability R per
+                                segment, a segment is delivered with probability K while good
+                                (default 1) and H while bad (default 0)
+        Sizes take K, M and G suffixes (powers of 1000). Each direction draws from its own generator
+        seeded from --seed, so a run can be repeated and traffic in one direction does not change
+        the drops in the other. Every sender address gets its own port towards the receiver, so a
+        receiver in server mode sees the senders apart. The counters of both links are printed when
+        the relay stops.
+"""
+import sys, time, socket, random, heapq, selectors, argparse, logging
+
+SUFFIXES = {"K": 1000, "M": 1000 ** 2, "G": 1000 ** 3}
+BUFFERSIZE = 65536
+# default time in ms a reordered segment is held back
+REORDER_GAP = 10
+
+
+# drop each segment independently with probability p
+class Bernoulli:
+    def __init__(self, p, rng=random) -> None:
+        self.p = float(p)
+        self.rng = rng
+
+    def drop(self):
+        return self.p > 0 and self.rng.random() < self.p
+
+# two state burst loss: good -> bad with probability p, bad -> good with probability r,
+# a segment gets through with probability k in the good state and h in the bad one
+class GilbertElliott:
+    def __init__(self, p, r, h=0.0, k=1.0, rng=random) -> None:
+        self.p = float(p)
+        self.r = float(r)
+        self.h = float(h)
+        self.k = float(k)
+        self.rng = rng
+        self.bad = False
+
+    def drop(self):
+        if self.bad:
+            self.bad = self.rng.random() >= self.r
+        else:
+            self.bad = self.rng.random() < self.p
+        return self.rng.random() >= (self.h if self.bad else self.k)
+
+# a loss model from a probability or "ge:P,R[,H[,K]]"
+def loss_model(spec, rng=random):
+    if isinstance(spec, str) and spec.startswith("ge:"):
+        return GilbertElliott(*(float(value) for value in spec[3:].split(",")), rng=rng)
+    return Bernoulli(spec, rng)
+
+def parse_size(text):
+    multiplier = SUFFIXES.get(text[-1:].upper())
+    return float(text[:-1]) * multiplier if multiplier else float(text)
+
+
+# one direction of the emulated network
+class Link:
+    def __init__(self, delay=0.0, jitter=0.0, rate=None, queue=None, reorder=0.0, reorder_gap=REORDER_GAP, duplicate=0.0,
+                 loss="0", rng=None) -> None:
+        '''
+        :param delay: one-way delay in ms.
+        :param jitter: the most random delay in ms added to delay.
+        :param rate: bytes per second the link sends, None for no limit.
+        :param queue: most bytes waiting for the link, None for no limit.
+        :param reorder: probability a segment is held back reorder_gap ms.
+        :param reorder_gap: see reorder, in ms.
+        :param duplicate: probability a segment is delivered twice.
+        :param loss: loss model, see loss_model.
+        :param rng: random generator of the link's decisions.
+        '''
+        self.rng = rng or random.Random()
+        self.delay = float(delay) / 1000
+        self.jitter = float(jitter) / 1000
+        self.rate = rate
+        self.queue = queue
+        self.reorder = float(reorder)
+        self.reorder_gap = float(reorder_gap) / 1000
+        self.duplicate = float(duplicate)
+        self.loss = loss_model(loss, self.rng)
+        # when the link has sent everything queued so far
+        self.busy_until = 0.0
+        self.received = 0
+        self.delivered = 0
+        self.lost = 0
+        self.queue_drops = 0
+        self.reordered = 0
+        self.duplicated = 0
+
+    # the times a segment of size bytes arriving now is delivered at, empty if it is dropped
+    def schedule(self, now, size):
+        self.received += 1
+        if self.loss.drop():
+            self.lost += 1
+            return []
+        departure = now
+        if self.rate:
+            start = max(now, self.busy_until)
+            if self.queue is not None and (start - now) * self.rate + size > self.queue:
+                self.queue_drops += 1
+                return []
+            self.busy_until = departure = start + size / self.rate
+        arrival = departure + self.delay
+        if self.jitter:
+            arrival += self.rng.uniform(0, self.jitter)
+        if self.reorder and self.rng.random() < self.reorder:
+            self.reordered += 1
+            arrival += self.reorder_gap
+        times = [arrival]
+        if self.duplicate and self.rng.random() < self.duplicate:
+            self.duplicated += 1
+            times.append(arrival)
+        self.delivered += len(times)
+        return times
+
+    def stats(self):
+        return {"received": self.received, "delivered": self.delivered, "lost": self.lost, "queue_drops": self.queue_drops,
+                "reordered": self.reordered, "duplicated": self.duplicated}
+
+
+class Relay:
+    def __init__(self, relay_port: int, receiver_port: int, forward: Link, reverse: Link, idle_timeout: float = None) -> None:
+        '''
+        :param relay_port: the UDP port the sender sends to.
+        :param receiver_port: the UDP port of the receiver.
+        :param forward: the link from the sender to the receiver.
+        :param reverse: the link from the receiver to the sender.
+        :param idle_timeout: stop after this many seconds without a segment, None to run until interrupted.
+        '''
+        self.address = "127.0.0.1"
+        self.receiver_address = (self.address, int(receiver_port))
+        self.forward = forward
+        self.reverse = reverse
+        self.idle_timeout = idle_timeout
+        self.relay_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.relay_socket.bind((self.address, int(relay_port)))
+        self.relay_socket.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.relay_socket, selectors.EVENT_READ, None)
+        # a socket towards the receiver per sender address, and the sender of each
+        self.upstream = {}
+        # (delivery time, order, socket, segment, address) of the segments in flight
+        self.in_flight = []
+        self.order = 0
+
+    # the socket that carries a sender's segments to the receiver
+    def upstream_socket(self, sender_address):
+        sock = self.upstream.get(sender_address)
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.address, 0))
+            sock.setblocking(False)
+            self.upstream[sender_address] = sock
+            self.selector.register(sock, selectors.EVENT_READ, sender_address)
+        return sock
+
+    def run(self) -> None:
+        last_activity = time.time()
+        while True:
+            now = time.time()
+            timeout = None
+            if self.in_flight:
+                timeout = max(self.in_flight[0][0] - now, 0)
+            elif self.idle_timeout is not None:
+                timeout = max(last_activity + self.idle_timeout - now, 0)
+                if timeout == 0:
+                    break
+            for key, _ in self.selector.select(timeout):
+                self.receive(key.fileobj, key.data, time.time())
+                last_activity = time.time()
+            self.deliver(time.time())
+        self.close()
+
+    # read every segment waiting on sock, sender_address is None for the relay port
+    def receive(self, sock, sender_address, now):
+        while True:
+            try:
+                data, address = sock.recvfrom(BUFFERSIZE)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            if sender_address is None:
+                link, out, destination = self.forward, self.upstream_socket(address), self.receiver_address
+            else:
+                link, out, destination = self.reverse, self.relay_socket, sender_address
+            for arrival in link.schedule(now, len(data)):
+                heapq.heappush(self.in_flight, (arrival, self.order, out, data, destination))
+                self.order += 1
+
+    # send the segments that are due
+    def deliver(self, now):
+        while self.in_flight and self.in_flight[0][0] <= now:
+            _, _, sock, data, destination = heapq.heappop(self.in_flight)
+            try:
+                sock.sendto(data, destination)
+            except OSError:
+                # nobody listening there, as if lost on the way
+                pass
+
+    def close(self):
+        self.selector.close()
+        for sock in self.upstream.values():
+            sock.close()
+        self.relay_socket.close()
+
+# one value for both directions or FORWARD/REVERSE
+def directions(text, convert=float):
+    forward, _, reverse = text.partition("/")
+    return convert(forward), convert(reverse or forward)
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(usage="python3 relay.py relay_port receiver_port [options]")
+    parser.add_argument("relay_port", type=int)
+    parser.add_argument("receiver_port", type=int)
+    parser.add_argument("--delay", default="0", help="one-way delay in ms")
+    parser.add_argument("--jitter", default="0", help="most random delay in ms added to --delay")
+    parser.add_argument("--rate", default=None, help="bytes per second, e.g. 1M")
+    parser.add_argument("--queue", default=None, help="most bytes queued for --rate, e.g. 64K")
+    parser.add_argument("--reorder", default="0", help="probability a segment is held back --reorder-gap ms")
+    parser.add_argument("--reorder-gap", default=str(REORDER_GAP), help=f"ms a reordered segment is held back (default: {REORDER_GAP})")
+    parser.add_argument("--duplicate", default="0", help="probability a segment is delivered twice")
+    parser.add_argument("--loss", default="0", help="drop probability, or ge:P,R[,H[,K]] for Gilbert-Elliott burst loss")
+    parser.add_argument("--seed", type=int, default=None, help="seed the links so a run can be repeated")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="exit after this many seconds without a segment")
+    args = parser.parse_args()
+
+    size = lambda text: parse_size(text) if text else None
+    links = []
+    for i, name in enumerate(("forward", "reverse")):
+        pick = lambda text, convert=float: directions(text, convert)[i] if text else None
+        links.append(Link(delay=pick(args.delay), jitter=pick(args.jitter), rate=pick(args.rate, size), queue=pick(args.queue, size),
+                          reorder=pick(args.reorder), reorder_gap=pick(args.reorder_gap), duplicate=pick(args.duplicate),
+                          loss=pick(args.loss, str), rng=random.Random(None if args.seed is None else args.seed * 2 + i)))
+    relay = Relay(args.relay_port, args.receiver_port, *links, idle_timeout=args.idle_timeout)
+    try:
+        relay.run()
+    except KeyboardInterrupt:
+        relay.close()
+    for name, link in zip(("forward", "reverse"), links):
+        logging.info(f"{name}: {link.stats()}")
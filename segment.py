@@ -1,3 +1,5 @@
+import struct, socket
+
 # types
 DATA = 0
 ACK = 1
@@ -5,19 +7,144 @@ SYN = 2
 FIN = 3
 RESET = 4
 
+# header version, carried in the high byte of the type field
+VERSION = 2
+# sequence and ack numbers are 32 bits and wrap around
+SEQ_SPACE = 2 ** 32
+
+# options carried in the data of a SYN and of the ACK that answers it, each one is kind, length, value
+OPT_WINDOW = 1
+OPT_SACK_PERMITTED = 2
+OPT_MSS = 3
+OPT_OFFSET = 4
+OPT_COMPRESS = 5
+OPT_ACK_DELAY = 6
+# values of OPT_COMPRESS: the payload of the connection is one zlib stream
+COMPRESS_ZLIB = b'\x01'
+# most SACK blocks carried by one ACK
+MAX_SACK_BLOCKS = 8
+
+# largest shift a scaled window can use, as in TCP this allows windows up to 1 GB
+MAX_WINDOW_SHIFT = 14
+
+# header: type (version in the high byte) and seqno, big endian
+HEADER = struct.Struct('!HI')
+HEADER_SIZE = HEADER.size
+# one SACK block: start and end seqno
+SACK_BLOCK = struct.Struct('!II')
+
+# payload size used when the peer does not negotiate one, and the largest that fits a UDP datagram over IPv4
+DEFAULT_MSS = 1000
+MAX_MSS = 65507 - HEADER_SIZE
+
 # create segment by adding type and seqno header to data 
 def pack_segment(type, seqno, data):
-    type = type.to_bytes(2, 'big')
-    seqno = seqno.to_bytes(2, 'big')
-    if data == None:
-        return type + seqno
-    return type + seqno + data
+    header = HEADER.pack((VERSION << 8) | type, seqno)
+    if data is None:
+        return header
+    return header + data
+
+# write a segment into a preallocated buffer and return its length,
+# with data None only the header is written, for a payload already in buffer[HEADER_SIZE:]
+def pack_into(buffer, type, seqno, data=None):
+    HEADER.pack_into(buffer, 0, (VERSION << 8) | type, seqno)
+    if data is None:
+        return HEADER_SIZE
+    end = HEADER_SIZE + len(data)
+    buffer[HEADER_SIZE:end] = data
+    return end
 
 # extract information from a packed segment, return type, seqno, data 
+# data is a memoryview into the segment, copy it if it must outlive a reused receive buffer
+# raise ValueError for a segment of another header version
 def unpack_segment(data):
-    type = data[:2]
-    seqno = data[2:4]
-    data = data[4:]
-    type = int.from_bytes(type, 'big')
-    seqno = int.from_bytes(seqno, 'big')
-    return type, seqno, data
+    if len(data) < HEADER_SIZE:
+        raise ValueError("not a PTP version 2 segment")
+    type, seqno = HEADER.unpack_from(data)
+    if type >> 8 != VERSION:
+        raise ValueError("not a PTP version 2 segment")
+    return type & 0xFF, seqno, memoryview(data)[HEADER_SIZE:]
+
+# serial number arithmetic on the sequence space (RFC 1982), numbers less than half the space apart compare correctly across a wrap
+def seq_add(seqno, n):
+    return (seqno + n) % SEQ_SPACE
+
+# signed distance from b to a
+def seq_diff(a, b):
+    return (a - b + SEQ_SPACE // 2) % SEQ_SPACE - SEQ_SPACE // 2
+
+def seq_lt(a, b):
+    return seq_diff(a, b) < 0
+
+def seq_leq(a, b):
+    return seq_diff(a, b) <= 0
+
+# pack a dict of option kind -> value bytes
+def pack_options(options):
+    data = b''
+    for kind, value in options.items():
+        data += kind.to_bytes(1, 'big') + len(value).to_bytes(1, 'big') + value
+    return data
+
+# unpack the options of a SYN or its ACK into a dict of kind -> value bytes, unknown kinds are kept and ignored by the caller
+def unpack_options(data):
+    options = {}
+    pos = 0
+    while pos + 2 <= len(data):
+        kind = data[pos]
+        length = data[pos + 1]
+        options[kind] = bytes(data[pos + 2:pos + 2 + length])
+        pos += 2 + length
+    return options
+
+# a window in bytes as a 16-bit value and the shift that scales it
+def pack_window(window):
+    shift = 0
+    while window >> shift > 0xFFFF and shift < MAX_WINDOW_SHIFT:
+        shift += 1
+    return min(window >> shift, 0xFFFF).to_bytes(2, 'big') + shift.to_bytes(1, 'big')
+
+def unpack_window(value):
+    return int.from_bytes(value[:2], 'big') << min(value[2], MAX_WINDOW_SHIFT)
+
+# the largest payload an endpoint sends or accepts, as a 16-bit value
+def pack_mss(mss):
+    return min(mss, MAX_MSS).to_bytes(2, 'big')
+
+def unpack_mss(value):
+    return min(int.from_bytes(value[:2], 'big'), MAX_MSS)
+
+# the most time in ms a receiver holds back an ACK, as a 16-bit value
+def pack_ack_delay(delay):
+    return min(delay, 0xFFFF).to_bytes(2, 'big')
+
+def unpack_ack_delay(value):
+    return int.from_bytes(value[:2], 'big')
+
+# where in the file the bytes of a connection go, for a file striped over several connections, as a 64-bit value
+def pack_offset(offset):
+    return offset.to_bytes(8, 'big')
+
+def unpack_offset(value):
+    return int.from_bytes(value[:8], 'big')
+
+# SACK blocks in the data of an ACK, each one is the start and end seqno of a range received above the cumulative ack
+def pack_sack(blocks):
+    return b''.join(SACK_BLOCK.pack(start, end) for start, end in blocks)
+
+# write SACK blocks into buffer at offset, return the offset after them
+def pack_sack_into(buffer, offset, blocks):
+    for start, end in blocks:
+        SACK_BLOCK.pack_into(buffer, offset, start, end)
+        offset += SACK_BLOCK.size
+    return offset
+
+def unpack_sack(data):
+    return list(SACK_BLOCK.iter_unpack(data[:len(data) - len(data) % SACK_BLOCK.size]))
+
+# apply the SO_SNDBUF and SO_RCVBUF sizes asked for to a socket, None leaves the system default, the kernel may round or cap them
+def set_socket_buffers(sock, sndbuf, rcvbuf):
+    if sndbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
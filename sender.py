@@ -15,12 +15,23 @@
 # here are the libs you may find it useful:
 import datetime, time  # to calculate the time delta of packet transmission
 import logging, sys  # to write the log
+import os
+import argparse
 import socket  # Core lib, to send packet via UDP socket
-from threading import Thread  # (Optional)threading will make the timer easily implemented
+import selectors
+import mmap
+from threading import Thread, Condition  # (Optional)threading will make the timer easily implemented
 import segment
-from dataclasses import dataclass
+import congestion
+import ptp_trace
+import metrics
+import compression
+from timers import TimerHeap, RttEstimator
+from collections import deque
 import random
 BUFFERSIZE = 1024
+# duplicate ACKs that trigger a fast retransmit
+DUP_THRESH = 3
 # sender states
 CLOSED = 0
 SYN_SENT = 1
@@ -28,24 +39,116 @@ ESTABLISHED = 2
 CLOSING = 3
 FIN_WAIT = 4
 
-@dataclass
+# an in-flight DATA segment, its payload is length bytes at offset in the file and is only packed when sent
 class Segment:
-    type: int 
-    seqno: int
-    data: bytes
-    exp_ack: int
-    packet: bytes
-    ack_received: bool = False
+    __slots__ = ('seqno', 'offset', 'length', 'exp_ack', 'ack_received', 'sent_time', 'retransmitted')
+
+    def __init__(self, seqno, offset, length, exp_ack) -> None:
+        self.seqno = seqno
+        self.offset = offset
+        self.length = length
+        self.exp_ack = exp_ack
+        self.ack_received = False
+        # time of the last transmission, and whether it was resent (Karn: no RTT sample then)
+        self.sent_time = 0.0
+        self.retransmitted = False
+
+# sliding window of in-flight segments: a deque ordered by seqno plus a seqno -> segment index,
+# a cumulative ACK pops acked segments off the front and a SACK block is found through the index
+class SendWindow:
+    def __init__(self) -> None:
+        self.segments = deque()
+        self.by_seqno = {}
+        # SACK scoreboard: start -> end of the ranges the receiver reported holding
+        self.sacked = {}
+        self.highest_sacked = None
+
+    def __len__(self):
+        return len(self.segments)
+
+    def append(self, packet):
+        self.segments.append(packet)
+        self.by_seqno[packet.seqno] = packet
+
+    # cumulative ack: every byte before ack_seqno has arrived, drop those segments and their payloads
+    # return the segments newly acknowledged
+    def ack(self, ack_seqno):
+        acked = []
+        while self.segments and segment.seq_leq(self.segments[0].exp_ack, ack_seqno):
+            packet = self.segments.popleft()
+            del self.by_seqno[packet.seqno]
+            acked.append(packet)
+        if acked and self.sacked:
+            self.sacked = {start: end for start, end in self.sacked.items() if segment.seq_lt(ack_seqno, end)}
+            if not self.sacked:
+                self.highest_sacked = None
+        return acked
+
+    # selective ack: the receiver holds start up to end, mark those segments so they are not retransmitted
+    # return the segments newly marked
+    def sack(self, start, end):
+        known = self.sacked.get(start)
+        if known is not None and segment.seq_leq(end, known):
+            return []
+        # only walk the part of the range we have not marked yet
+        packet = self.by_seqno.get(start if known is None else known)
+        marked = []
+        while packet is not None and segment.seq_leq(packet.exp_ack, end):
+            if not packet.ack_received:
+                packet.ack_received = True
+                marked.append(packet)
+            packet = self.by_seqno.get(packet.exp_ack)
+        self.sacked[start] = end
+        if self.highest_sacked is None or segment.seq_lt(self.highest_sacked, end):
+            self.highest_sacked = end
+        return marked
+
+    # return the oldest unacknowledged segment, or None if everything is acked
+    def oldest_unacked(self):
+        if self.segments:
+            return self.segments[0]
+        return None
+
+    # the segments the receiver is missing: unacked segments below the highest SACKed byte,
+    # or just the oldest one when there is no SACK information
+    def holes(self):
+        if self.highest_sacked is None:
+            return [self.segments[0]] if self.segments else []
+        holes = []
+        for packet in self.segments:
+            if not segment.seq_lt(packet.seqno, self.highest_sacked):
+                break
+            if not packet.ack_received:
+                holes.append(packet)
+        return holes
 
 class Sender:
-    def __init__(self, sender_port: int, receiver_port: int, filename: str, max_win: int, rot: int) -> None:
+    def __init__(self, sender_port: int, receiver_port: int, filename: str, max_win: int, rot: int, log_file: str = "Sender_log.txt", sack: bool = True, fixed_rto: bool = False, cc: str = "reno", cwnd_trace: str = None,
+                 mss: int = segment.DEFAULT_MSS, sndbuf: int = None, rcvbuf: int = None, trace: bool = False,
+                 metrics_target: str = None, metrics_interval: float = metrics.DEFAULT_INTERVAL, summary: bool = False,
+                 offset: int = None, length: int = None, compress: bool = False) -> None:
         '''
         The Sender will be able to connect the Receiver via UDP
         :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver
         :param receiver_port: the UDP port number on which receiver is expecting to receive PTP segments from the sender
         :param filename: the name of the text file that must be transferred from sender to receiver using your reliable transport protocol.
         :param max_win: the maximum window size in bytes for the sender window.
-        :param rot: the value of the retransmission timer in milliseconds. This should be an unsigned integer.
+        :param rot: the initial value of the retransmission timer in milliseconds. This should be an unsigned integer.
+        :param log_file: the file the sender log is written to.
+        :param sack: offer selective acknowledgements in the SYN.
+        :param fixed_rto: always use rot as the retransmission timer instead of adapting it to the measured RTT.
+        :param cc: the congestion control algorithm, one of congestion.ALGORITHMS.
+        :param cwnd_trace: if given, a file where every change of cwnd is recorded.
+        :param mss: the largest payload offered in the SYN, the receiver may accept less.
+        :param sndbuf: if given, the SO_SNDBUF size of the socket in bytes.
+        :param rcvbuf: if given, the SO_RCVBUF size of the socket in bytes.
+        :param trace: write the log as a binary trace to log_file with the extension .trace, see ptp_trace.
+        :param metrics_target: if given, where a JSON snapshot of stats() is sent every metrics_interval seconds, see metrics.
+        :param metrics_interval: seconds between two snapshots.
+        :param summary: also write the final stats as JSON to log_file with the extension .json.
+        :param offset: if given, send only the bytes of the file from offset on and ask the receiver to write them at the same offset, see striped.
+        :param length: with offset, the most bytes to send.
+        :param compress: offer to send the file zlib compressed if it compresses well, see compression.
         '''
         self.sender_port = int(sender_port)
         self.receiver_port = int(receiver_port)
@@ -53,9 +156,10 @@ class Sender:
         self.receiver_address = ("127.0.0.1", self.receiver_port)
 
         # init the UDP socket
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
         logging.debug(f"The sender is using the address {self.sender_address}")
-        self.sender_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-        self.sender_socket.bind(self.sender_address)
+        self.sender_socket = self.create_socket()
 
         #  (Optional) start the listening sub-thread first
         self._is_active = True  # for the multi-threading
@@ -64,21 +168,46 @@ class Sender:
 
         # todo add codes here
         self.state = CLOSED
-        self.isn = random.randint(0, 2 ** 16 - 1) # range 0 to 65535
+        self.isn = random.randint(0, segment.SEQ_SPACE - 1) # range 0 to 2 ** 32 - 1
         self.curr_seqno = self.isn 
         self.filename = filename
         self.max_win = int(max_win)
-        self.timeout = int(rot) / 1000
+        # window actually used, the smaller of max_win and the window the receiver accepts in the SYN exchange
+        self.send_win = self.max_win
+        self.sack = sack
+        # payload size, the smaller of the offered mss and the one the receiver accepts
+        self.mss = max(min(int(mss), segment.MAX_MSS), 1)
+        # retransmission timeout, starts at rot and follows the measured RTT
+        self.rtt = RttEstimator(int(rot) / 1000, fixed_rto)
         
         # 4. sliding window
-        self.unack_packets = []
-        self.base_pknum = 0 # list pos
-        self.next_pknum = 0 # list pos
+        self.window = SendWindow()
+        # one retransmission timer per in-flight segment, keyed by seqno
+        self.timers = TimerHeap()
+        # signalled by the listener whenever an ACK frees space in the window
+        self.window_changed = Condition()
+        # congestion window, fast retransmit and recovery state
+        self.cc_name = cc
+        self.cc = congestion.create(cc, self.mss)
+        self.dup_acks = 0
+        # seqno sent last when fast recovery started, and the time it started, None outside recovery
+        self.recovery_point = None
+        self.recovery_start = None
+        # expired segments a timeout held back, resent as ACKs come back, and when that timeout was
+        self.timeout_backlog = deque()
+        self.timeout_time = None
+        self.cwnd_trace = open(cwnd_trace, 'w') if cwnd_trace else None
+        self.traced_cwnd = None
         
         # 9. create log file
         # create a logger object
-        self.logging = logging.getLogger(__name__)
-        self.handler = logging.FileHandler("Sender_log.txt", mode = 'w')
+        # one logger per sender port so several senders can run in one process
+        self.logging = logging.getLogger(f"{__name__}.{self.sender_port}")
+        if trace:
+            self.handler = self.trace = ptp_trace.TraceHandler(os.path.splitext(log_file)[0] + ".trace")
+        else:
+            self.handler = logging.FileHandler(log_file, mode = 'w')
+            self.trace = None
         self.formatter = logging.Formatter('%(message)s')
         self.handler.setFormatter(self.formatter)
         self.logging.addHandler(self.handler)
@@ -89,16 +218,48 @@ class Sender:
         self.total_segment_sent = 0
         self.total_retransmitted = 0
         self.total_duplicate_ack = 0
+        self.total_retransmitted_bytes = 0
+        self.rtt_histogram = metrics.Histogram()
+        self.summary_file = os.path.splitext(log_file)[0] + ".json" if summary else None
+        # ACKs are received into one reused buffer
+        self.recv_buffer = bytearray(BUFFERSIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+        # DATA segments are packed into reused buffers, one for new data and one for the retransmissions
+        # of the listener, from source, a view of the memory-mapped file, or from the zlib stream when compressed
+        # the negotiated mss is never above the offered one, so the buffers are sized once
+        self.send_buffer = bytearray(segment.HEADER_SIZE + self.mss)
+        self.send_view = memoryview(self.send_buffer)
+        self.retransmit_buffer = bytearray(segment.HEADER_SIZE + self.mss)
+        self.retransmit_view = memoryview(self.retransmit_buffer)
+        self.mapping = None
+        self.source = None
+        self.next_offset = 0
+        self.end_offset = 0
+        self.offset = offset
+        self.length = length
+        # compression asked for, and whether the receiver agreed to it
+        self.compress = compress
+        self.compressed = False
+        # bytes of the file to send, and the zlib stream segments are cut from when compressed
+        self.original_bytes = 0
+        self.stream = None
+        self.reporter = metrics.MetricsReporter(self.stats, metrics_target, metrics_interval) if metrics_target else None
         pass
 
+    def create_socket(self):
+        sender_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        segment.set_socket_buffers(sender_socket, self.sndbuf, self.rcvbuf)
+        sender_socket.bind(self.sender_address)
+        return sender_socket
+
     def ptp_open(self):
         # todo add/modify codes here
         # send a greeting message to receiver
-        syn_segment = segment.pack_segment(segment.SYN, self.curr_seqno, None)
+        syn_segment = self.syn_packet()
         success = False
         attempt = 0
         while success == False and attempt < 3:
-            self.sender_socket.sendto(syn_segment, self.receiver_address)
+            self.transmit(syn_segment)
             self.state = SYN_SENT
             self.start_time = time.time()
             self.write_to_log(0, segment.SYN, self.curr_seqno, 0)
@@ -106,66 +267,60 @@ class Sender:
             if self.try_receive_ACK() == True:
                 success = True
                 self.state = ESTABLISHED
+                if attempt == 0:
+                    self.sample_rtt(time.time() - self.start_time)
+                # the SYN timeouts say nothing about the path now that it answered
+                self.rtt.reset_backoff()
+            else:
+                self.rtt.backoff()
             attempt += 1
          
         if success == False:
-            reset_segment = segment.pack_segment(segment.RESET, 0, None)
-            self.sender_socket.sendto(reset_segment, self.receiver_address)
-            self.write_to_log(time.time(), segment.RESET, 0, 0)
-            self.state = CLOSED 
+            self.send_reset()
             self.sender_socket.close()    
         pass
 
     def ptp_send(self):
         # todo add codes here
+        # lets ptp_send wake the listener when it starts a timer or the transfer ends
+        self.wake_listener, self.wake_sender = socket.socketpair()
         listen_thread = Thread(target=self.listen)
         listen_thread.start()
-        file = open(self.filename, 'rb')
+        self.open_source()
         
         while True: 
-            
-            
-            # Check if the window is full
-            if self.next_pknum < self.base_pknum + self.max_win / 1000:
-                data = file.read(1000)
-                if not data:
-                    # end of file
-                    break
-                # send next packet 
-                # Maximum segment size is 1000
-                data_segment = segment.pack_segment(segment.DATA, self.curr_seqno, data)
-                
-                if not self.unack_packets or self.oldest_unack_inlist() == -1:
-                    self.addtimer()
-                self.sender_socket.sendto(data_segment, self.receiver_address)
-                self.write_to_log(time.time(), segment.DATA, self.curr_seqno, len(data))
-                self.total_data += len(data)
-                self.total_segment_sent += 1
-                packet = Segment(segment.DATA, self.curr_seqno, data, (self.curr_seqno + len(data)) % (2 ** 16), data_segment, False)
-                self.curr_seqno = (self.curr_seqno + len(data)) % (2 ** 16)
-                self.unack_packets.append(packet)
-                
-                self.next_pknum += 1
+            # wait until an ACK frees space if the window is full
+            with self.window_changed:
+                while self.window_full():
+                    self.window_changed.wait()
+            if self.next_segment() is None:
+                # end of file
+                break
 
         self.state = CLOSING
-         
-        while self.oldest_unack_inlist() != -1:
-            # wait
-            self._is_active = True
+        
+        # wait for the listener to see every segment acknowledged
+        with self.window_changed:
+            while self.window.oldest_unacked() is not None:
+                self.window_changed.wait()
         self._is_active = False
+        self.wake()
         listen_thread.join()
+        self.wake_listener.close()
+        self.wake_sender.close()
+        self.close_source()
         pass 
         
 
     def ptp_close(self):
         
-        self.curr_seqno = (self.curr_seqno + 1) % (2 ** 16)
+        self.curr_seqno = segment.seq_add(self.curr_seqno, 1)
         fin_segment = segment.pack_segment(segment.FIN, self.curr_seqno, None)
         success = False
         attempt = 0
         while success == False and attempt < 3:
             self.addtimer()
-            self.sender_socket.sendto(fin_segment, self.receiver_address)
+            self.transmit(fin_segment)
             self.state = FIN_WAIT
             self.write_to_log(time.time(), segment.FIN, self.curr_seqno, 0)
             
@@ -174,10 +329,7 @@ class Sender:
             attempt += 1
          
         if success == False:
-            reset_segment = segment.pack_segment(segment.RESET, 0, None)
-            self.sender_socket.sendto(reset_segment, self.receiver_address)
-            self.write_to_log(time.time(), segment.RESET, 0, 0)
-            self.state = CLOSED
+            self.send_reset()
         
         self.sender_socket.close()    
         pass
@@ -185,28 +337,22 @@ class Sender:
     def listen(self):
         '''(Multithread is used)listen the response from receiver'''
         logging.debug("Sub-thread for listening is running")
+        # wait for an ACK, a wake-up from ptp_send or the next retransmission deadline, whichever comes first
+        selector = selectors.DefaultSelector()
+        selector.register(self.sender_socket, selectors.EVENT_READ)
+        selector.register(self.wake_listener, selectors.EVENT_READ)
         while self._is_active:
-            try:
-                incoming_message, _ = self.sender_socket.recvfrom(BUFFERSIZE)
-                segment_type, segment_seqno, data = segment.unpack_segment(incoming_message)
-                if segment_type == segment.ACK:
-                    self.write_to_log(time.time(), segment.ACK, segment_seqno, 0)
-                    result = -1
-                    while result == -1:
-                        result = self.set_segment_received(segment_seqno)
-                    self.base_pknum += 1
-            except socket.timeout:
-                # resend the oldest unack packet             
-                pos = self.oldest_unack_inlist()
-                if pos == -1:
-                    continue
-                else: 
-                    packet = self.unack_packets[pos]
-                    retransmit_segment = packet.packet
-                    self.sender_socket.sendto(retransmit_segment, self.receiver_address)
-                    self.write_to_log(time.time(), segment.DATA, packet.seqno, len(packet.data))
-                    self.total_retransmitted += 1
-                    self.addtimer()
+            with self.window_changed:
+                deadline = self.timers.next_deadline()
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            for key, _ in selector.select(timeout):
+                if key.fileobj is self.wake_listener:
+                    self.wake_listener.recv(BUFFERSIZE)
+                else:
+                    nbytes = self.sender_socket.recv_into(self.recv_buffer)
+                    self.handle_ack(self.recv_view[:nbytes])
+            self.retransmit_expired(time.time())
+        selector.close()
 
     def run(self):
         '''
@@ -214,46 +360,387 @@ class Sender:
         '''
         # todo add/modify codes here
         self.ptp_open()
+        # a failed handshake has already reset the connection and closed the socket
         if self.state == ESTABLISHED:
             self.ptp_send()
-        self.ptp_close()
+            self.ptp_close()
+        self.log_summary()
+
+    def log_summary(self):
         self.logging.info(f"Amount of (original) Data Transferred(in bytes)(excluding retransmissions): {self.total_data}")
+        if self.compressed:
+            self.logging.info(f"Amount of Data before compression(in bytes): {self.original_bytes}")
         self.logging.info(f"Number of Data Segments Sent(excluding transmissions): {self.total_segment_sent}")
         self.logging.info(f"Number of Retransmitted Data Segments: {self.total_retransmitted}")
         self.logging.info(f"Number of Duplicate Acknowledgments received: {self.total_duplicate_ack}")
+        srtt = "n/a" if self.rtt.srtt is None else round(self.rtt.srtt * 1000, 2)
+        self.logging.info(f"Estimated RTT(in ms): {srtt}")
+        self.logging.info(f"Retransmission Timeout(in ms): {round(self.rtt.rto * 1000, 2)}")
+        if self.cwnd_trace is not None:
+            self.cwnd_trace.close()
+            self.cwnd_trace = None
+        if self.reporter is not None:
+            self.reporter.stop()
+        if self.summary_file is not None:
+            metrics.write_summary(self.summary_file, self.stats())
+        self.logging.removeHandler(self.handler)
+        self.handler.close()
 
-    # only used by ptp_open and ptp_close to receive ack for SYN and FIN
+    # counters, rates, window and RTT of the transfer so far, safe to call from any thread while it runs
+    def stats(self):
+        # the listener pops acknowledged segments off the window, read it under the same lock
+        with self.window_changed:
+            elapsed = None if self.start_time is None else time.time() - self.start_time
+            in_flight = self.flight_bytes() if self.source is not None else 0
+            acked = self.total_data - in_flight
+            # the bytes of the file the acknowledged segments carry, in proportion when compressed
+            original_acked = acked
+            if self.stream is not None:
+                original_acked = acked * self.stream.consumed // self.stream.produced if self.stream.produced else 0
+            return {
+                "role": "sender",
+                "state": self.state,
+                "elapsed": elapsed,
+                "bytes_sent": self.total_data,
+                "bytes_acked": acked,
+                "compressed": self.compressed,
+                "original_bytes": self.original_bytes,
+                "original_acked": original_acked,
+                "segments_sent": self.total_segment_sent,
+                "retransmitted": self.total_retransmitted,
+                "retransmitted_bytes": self.total_retransmitted_bytes,
+                "retransmission_rate": self.total_retransmitted / self.total_segment_sent if self.total_segment_sent else 0.0,
+                "duplicate_acks": self.total_duplicate_ack,
+                # bytes per second, throughput counts retransmissions and goodput only acknowledged data
+                "throughput": metrics.rate(self.total_data + self.total_retransmitted_bytes, elapsed),
+                "goodput": metrics.rate(acked, elapsed),
+                "original_goodput": metrics.rate(original_acked, elapsed),
+                "window": {
+                    "segments": len(self.window),
+                    "bytes": in_flight,
+                    "cwnd": metrics.finite(self.cc.cwnd),
+                    "ssthresh": metrics.finite(self.cc.ssthresh),
+                    "send_win": self.send_win,
+                    "mss": self.mss,
+                    "in_recovery": self.recovery_point is not None,
+                },
+                "rtt": {
+                    "srtt_ms": None if self.rtt.srtt is None else self.rtt.srtt * 1000,
+                    "rttvar_ms": None if self.rtt.rttvar is None else self.rtt.rttvar * 1000,
+                    "rto_ms": self.rtt.rto * 1000,
+                    "histogram": self.rtt_histogram.to_dict(),
+                },
+            }
+
+    # only used by ptp_open and ptp_close to receive ack for SYN and FIN, other segments are skipped until the timeout
     def try_receive_ACK(self):
+        deadline = time.time() + self.rtt.rto
         try:
-            incoming_segment, _ = self.sender_socket.recvfrom(BUFFERSIZE)
-            segment_type, segment_seqno, data = segment.unpack_segment(incoming_segment)
-            if segment_type == segment.ACK:
-                self.write_to_log(time.time(), segment.ACK, segment_seqno, 0)
-                self.curr_seqno = segment_seqno
-                return True
+            while True:
+                nbytes = self.sender_socket.recv_into(self.recv_buffer)
+                if self.accept_ACK(self.recv_view[:nbytes]):
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.sender_socket.settimeout(remaining)
         except socket.timeout: 
             return False
 
+    # check that a segment is the ACK of our SYN or FIN, the one acknowledging its seqno (curr_seqno),
+    # a late cumulative ACK of data is not
+    def accept_ACK(self, incoming_segment):
+        try:
+            segment_type, segment_seqno, data = segment.unpack_segment(incoming_segment)
+        except ValueError:
+            return False
+        if segment_type == segment.ACK:
+            self.write_to_log(time.time(), segment.ACK, segment_seqno, 0)
+            if segment_seqno != segment.seq_add(self.curr_seqno, 1):
+                return False
+            self.curr_seqno = segment_seqno
+            if self.state == SYN_SENT:
+                self.accept_options(segment.unpack_options(data))
+            return True
+        return False
+
+    # SYN offering our window, mss and SACK, the receiver answers with the window and mss it accepts
+    def syn_packet(self):
+        options = {segment.OPT_WINDOW: segment.pack_window(self.max_win), segment.OPT_MSS: segment.pack_mss(self.mss)}
+        if self.sack:
+            options[segment.OPT_SACK_PERMITTED] = b''
+        if self.offset is not None:
+            options[segment.OPT_OFFSET] = segment.pack_offset(self.offset)
+        if self.compress and compression.compressible(self.filename, self.offset or 0):
+            options[segment.OPT_COMPRESS] = segment.COMPRESS_ZLIB
+        return segment.pack_segment(segment.SYN, self.curr_seqno, segment.pack_options(options))
+
+    # apply the options in the ACK of our SYN
+    def accept_options(self, options):
+        if segment.OPT_WINDOW in options:
+            self.send_win = min(self.max_win, segment.unpack_window(options[segment.OPT_WINDOW]))
+        # a receiver that does not answer with an mss only takes the default one
+        self.mss = min(self.mss, segment.unpack_mss(options[segment.OPT_MSS]) if segment.OPT_MSS in options else segment.DEFAULT_MSS)
+        self.cc = congestion.create(self.cc_name, self.mss)
+        # a receiver that does not echo the offset would write the range at the start of the file
+        if self.offset is not None and segment.OPT_OFFSET not in options:
+            raise ConnectionError("the receiver does not accept a byte range")
+        self.compressed = options.get(segment.OPT_COMPRESS) == segment.COMPRESS_ZLIB
+        if segment.OPT_ACK_DELAY in options:
+            self.rtt.add_ack_delay(segment.unpack_ack_delay(options[segment.OPT_ACK_DELAY]) / 1000)
+
+    # the effective window is the smaller of cwnd and the window agreed in the SYN exchange, at least one segment
+    def window_full(self):
+        return len(self.window) >= max(min(self.cc.cwnd, self.send_win) / self.mss, 1)
+
     def addtimer(self):
-        self.sender_socket.settimeout(self.timeout)
+        self.sender_socket.settimeout(self.rtt.rto)
+
+    # start the retransmission timer of a segment just sent, waking the listener if it is now the earliest
+    def arm_timer(self, packet, now):
+        with self.window_changed:
+            deadline = self.timers.next_deadline()
+            packet.sent_time = now
+            self.timers.add(packet.seqno, now + self.rtt.rto)
+        if deadline is None or now + self.rtt.rto < deadline:
+            self.wake()
+
+    # make the listener recompute its next deadline
+    def wake(self):
+        self.wake_sender.send(b'\0')
+
+    # send a packet to the receiver
+    def transmit(self, packet):
+        self.sender_socket.sendto(packet, self.receiver_address)
+
+    def send_reset(self):
+        reset_segment = segment.pack_segment(segment.RESET, 0, None)
+        self.transmit(reset_segment)
+        self.write_to_log(time.time(), segment.RESET, 0, 0)
+        self.state = CLOSED
+
+    # map the file to send, segments are packed from slices of the mapping so the file is never read per segment
+    def open_source(self):
+        with open(self.filename, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                # an empty file cannot be mapped
+                self.source = memoryview(b'')
+            else:
+                self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.source = memoryview(self.mapping)
+        self.next_offset = 0
+        self.end_offset = len(self.source)
+        if self.offset is not None:
+            self.next_offset = min(self.offset, self.end_offset)
+            if self.length is not None:
+                self.end_offset = min(self.end_offset, self.next_offset + self.length)
+        self.original_bytes = self.end_offset - self.next_offset
+        if self.compressed:
+            # segments are cut from the zlib stream of the range, compressed as the window advances
+            self.stream = compression.CompressStream(self.source[self.next_offset:self.end_offset])
+            self.next_offset = 0
+
+    def close_source(self):
+        if self.stream is not None:
+            self.stream.close()
+        if self.source is not None:
+            self.source.release()
+            self.source = None
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    # pack a DATA segment from the mapped file or the zlib stream into buffer, return the length of the datagram
+    def pack_data(self, buffer, packet):
+        if self.stream is not None:
+            return segment.pack_into(buffer, segment.DATA, packet.seqno, self.stream.read(packet.offset, packet.length))
+        return segment.pack_into(buffer, segment.DATA, packet.seqno, self.source[packet.offset:packet.offset + packet.length])
+
+    # add the next chunk of the file to the window and send it, return None at end of file
+    def next_segment(self):
+        if self.stream is not None:
+            length = min(self.mss, self.stream.fill(self.next_offset + self.mss) - self.next_offset)
+        else:
+            length = min(self.mss, self.end_offset - self.next_offset)
+        if length <= 0:
+            return None
+        packet = Segment(self.curr_seqno, self.next_offset, length, segment.seq_add(self.curr_seqno, length))
+        
+        # add to the window and start its timer before sending so the listener can always match the ack
+        with self.window_changed:
+            self.window.append(packet)
+        now = time.time()
+        self.arm_timer(packet, now)
+        self.transmit(self.send_view[:self.pack_data(self.send_buffer, packet)])
+        self.write_to_log(now, segment.DATA, self.curr_seqno, length)
+        self.total_data += length
+        self.total_segment_sent += 1
+        self.next_offset += length
+        self.curr_seqno = segment.seq_add(self.curr_seqno, length)
+        return packet
+
+    # process a segment received from the receiver while data is in flight
+    def handle_ack(self, incoming_message):
+        try:
+            segment_type, segment_seqno, data = segment.unpack_segment(incoming_message)
+        except ValueError:
+            return
+        if segment_type == segment.ACK:
+            self.write_to_log(time.time(), segment.ACK, segment_seqno, 0)
+            self.set_segment_received(segment_seqno, segment.unpack_sack(data))
+
+    # the timers that expired together are one timeout, as with TCP's single timer: the RTO backs off once,
+    # cwnd collapses and the expired segments are resent oldest first as far as the new cwnd allows,
+    # every other in-flight segment restarts its timer so one delay spike does not resend the whole flight
+    def retransmit_expired(self, now):
+        with self.window_changed:
+            expired = [self.window.by_seqno.get(seqno) for seqno in self.timers.pop_expired(now)]
+            expired = [packet for packet in expired if packet is not None and not packet.ack_received]
+            if not expired:
+                return
+            self.rtt.backoff()
+            self.cc.on_timeout(self.flight_bytes(), now)
+            self.dup_acks = 0
+            self.recovery_point = None
+            self.trace_cwnd(now)
+            oldest = self.window.oldest_unacked()
+            expired.sort(key=lambda packet: segment.seq_diff(packet.seqno, oldest.seqno))
+            resend = []
+            budget = max(self.cc.cwnd, self.mss)
+            for packet in expired:
+                if resend and packet.length > budget:
+                    break
+                budget -= packet.length
+                resend.append(packet)
+            self.mark_retransmitted(resend, now)
+            self.timeout_time = now
+            held = {packet.seqno: packet for packet in list(self.timeout_backlog) + expired[len(resend):]}
+            self.timeout_backlog = deque(sorted(held.values(), key=lambda packet: segment.seq_diff(packet.seqno, oldest.seqno)))
+            # the rest of the flight, expired or not, waits a full backed-off RTO from now
+            for packet in self.window.segments:
+                if not packet.ack_received and packet not in resend:
+                    self.timers.add(packet.seqno, now + self.rtt.rto)
+        self.retransmit(resend)
+
+    # restart the timers of segments about to be resent, they no longer give RTT samples
+    def mark_retransmitted(self, packets, now):
+        for packet in packets:
+            packet.sent_time = now
+            packet.retransmitted = True
+            self.timers.add(packet.seqno, now + self.rtt.rto)
+
+    def retransmit(self, packets):
+        for packet in packets:
+            self.transmit(self.retransmit_view[:self.pack_data(self.retransmit_buffer, packet)])
+            self.write_to_log(time.time(), segment.DATA, packet.seqno, packet.length)
+            self.total_retransmitted += 1
+            self.total_retransmitted_bytes += packet.length
+
+    # bytes sent but not cumulatively acknowledged
+    def flight_bytes(self):
+        oldest = self.window.oldest_unacked()
+        if oldest is None:
+            return 0
+        return segment.seq_diff(self.curr_seqno, oldest.seqno)
     
-    # return the first position in the list where the struct boolean is false
-    def oldest_unack_inlist(self):
-        for i, segment in enumerate(self.unack_packets):
-            if not segment.ack_received:
-                return i
-        return -1
-
-    def set_segment_received(self, ack_seqno):
-        for segment in self.unack_packets:
-            if segment.exp_ack == ack_seqno:
-                if segment.ack_received == True:
-                    self.total_duplicate_ack += 1
-                segment.ack_received = True
-                return 0
-        return -1 
+    # apply a cumulative ack and its SACK blocks and cancel the timers of the segments they cover,
+    # the newest segment they acknowledge first gives an RTT sample,
+    # an ack that acknowledges nothing new is a duplicate
+    def set_segment_received(self, ack_seqno, sack_blocks=()):
+        now = time.time()
+        with self.window_changed:
+            oldest = self.window.oldest_unacked()
+            acked = self.window.ack(ack_seqno)
+            if acked and self.stream is not None:
+                # the compressed bytes up to the cumulative point will never be resent
+                self.stream.release(acked[-1].offset + acked[-1].length)
+            newly_acked = list(acked)
+            # segments acknowledged for the first time, the ones SACKed earlier have been waiting behind a hole
+            first_acked = [packet for packet in acked if not packet.ack_received]
+            for start, end in sack_blocks:
+                sacked = self.window.sack(start, end)
+                newly_acked += sacked
+                first_acked += sacked
+            for packet in newly_acked:
+                self.timers.cancel(packet.seqno)
+            # Karn: an ACK covering a retransmitted segment may answer either copy, it gives no sample
+            if first_acked and not any(packet.retransmitted for packet in first_acked):
+                self.sample_rtt(now - max(packet.sent_time for packet in first_acked))
+            # the cumulative point moved, the path works again so the backoff is dropped even without a sample
+            if acked:
+                self.rtt.reset_backoff()
+            lost = self.update_congestion(ack_seqno, acked, oldest, now)
+            if acked and self.timeout_backlog:
+                lost += self.timeout_backlog_due(sum(packet.length for packet in acked) + self.mss, lost)
+            self.mark_retransmitted(lost, now)
+            self.trace_cwnd(now)
+            self.window_changed.notify_all()
+            duplicate = not newly_acked
+            if duplicate:
+                self.total_duplicate_ack += 1
+        self.retransmit(lost)
+        return -1 if duplicate else 0
+
+    def sample_rtt(self, rtt):
+        self.rtt.sample(rtt)
+        self.rtt_histogram.record(rtt)
+
+    # feed an ACK to the congestion control, return the segments to fast retransmit
+    def update_congestion(self, ack_seqno, acked, oldest, now):
+        if acked:
+            self.dup_acks = 0
+            if self.recovery_point is None:
+                # cwnd only grows while it is what limits the sender
+                if self.cc.cwnd < self.send_win:
+                    self.cc.on_ack(sum(packet.length for packet in acked), now, self.rtt.srtt)
+                return []
+            if segment.seq_leq(self.recovery_point, ack_seqno):
+                self.recovery_point = None
+                self.cc.on_recovery_exit()
+                return []
+            # partial ack: resend the holes not resent since recovery started
+            return [packet for packet in self.window.holes() if packet.sent_time < self.recovery_start]
+        if oldest is None or ack_seqno != oldest.seqno:
+            return []
+        # the receiver is still waiting for the oldest segment
+        self.dup_acks += 1
+        if self.recovery_point is not None:
+            self.cc.on_dup_ack()
+            return []
+        if self.dup_acks != DUP_THRESH:
+            return []
+        self.recovery_point = self.curr_seqno
+        self.recovery_start = now
+        self.cc.on_loss(self.flight_bytes(), now)
+        return self.window.holes()
+
+    # the segments held back by the last timeout that an ACK lets out, as many bytes as it acknowledged plus one MSS
+    # as in slow start, skipping those acknowledged or resent since
+    def timeout_backlog_due(self, budget, lost):
+        due = []
+        while self.timeout_backlog:
+            packet = self.timeout_backlog[0]
+            if (packet.ack_received or self.window.by_seqno.get(packet.seqno) is not packet
+                    or packet.sent_time >= self.timeout_time or packet in lost):
+                self.timeout_backlog.popleft()
+                continue
+            if packet.length > budget:
+                break
+            budget -= packet.length
+            due.append(self.timeout_backlog.popleft())
+        return due
+
+    # record cwnd if it changed since the last record
+    def trace_cwnd(self, now):
+        if self.cwnd_trace is None or self.cc.cwnd == self.traced_cwnd:
+            return
+        self.traced_cwnd = self.cc.cwnd
+        self.cwnd_trace.write(f"{round((now - self.start_time) * 1000, 2)}\t{self.cc.cwnd}\t{self.cc.ssthresh}\n")
     
     def write_to_log(self, curr_time, type, seqno, len):
+        if self.trace is not None:
+            self.trace.packet((curr_time - self.start_time) * 1000, ptp_trace.RCV if type == segment.ACK else ptp_trace.SND, type, seqno, len)
+            return
         current_time = round((curr_time - self.start_time) * 1000, 2)
         if type == segment.SYN:
             self.logging.info(f"snd\t0\tSYN\t{seqno}\t0")
@@ -275,10 +762,39 @@ if __name__ == '__main__':
         format='%(asctime)s,%(msecs)03d %(levelname)-8s %(message)s',
         datefmt='%Y-%m-%d:%H:%M:%S')
 
-    if len(sys.argv) != 6:
-        print(
-            "\n===== Error usage, python3 sender.py sender_port receiver_port FileReceived.txt max_win rot ======\n")
-        exit(0)
+    parser = argparse.ArgumentParser(usage="python3 sender.py sender_port receiver_port FileReceived.txt max_win rot [options]")
+    parser.add_argument("sender_port", type=int)
+    parser.add_argument("receiver_port", type=int)
+    parser.add_argument("filename")
+    parser.add_argument("max_win", type=int)
+    parser.add_argument("rot", type=int)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run the sender on asyncio instead of a listener thread")
+    parser.add_argument("--no-sack", dest="sack", action="store_false", help="do not offer selective acknowledgements")
+    parser.add_argument("--fixed-rto", action="store_true", help="use rot as a fixed retransmission timer instead of adapting it to the RTT")
+    parser.add_argument("--cc", choices=sorted(congestion.ALGORITHMS), default="reno", help="congestion control algorithm (default: reno)")
+    parser.add_argument("--cwnd-trace", metavar="FILE", help="write time(ms), cwnd and ssthresh to FILE whenever cwnd changes")
+    parser.add_argument("--mss", type=int, default=segment.DEFAULT_MSS, help=f"largest payload to offer in the SYN, up to {segment.MAX_MSS} (default: {segment.DEFAULT_MSS})")
+    parser.add_argument("--sndbuf", type=int, default=None, help="SO_SNDBUF size of the socket in bytes")
+    parser.add_argument("--rcvbuf", type=int, default=None, help="SO_RCVBUF size of the socket in bytes")
+    parser.add_argument("--trace", action="store_true", help="write a binary trace to Sender_log.trace instead of Sender_log.txt, render it with ptp_trace.py")
+    parser.add_argument("--metrics", metavar="TARGET", help="send JSON stats snapshots to TARGET: udp:HOST:PORT, unix:PATH or a file")
+    parser.add_argument("--metrics-interval", type=float, default=metrics.DEFAULT_INTERVAL, help="seconds between two stats snapshots (default: 1)")
+    parser.add_argument("--summary", action="store_true", help="also write the final stats as JSON to Sender_log.json")
+    parser.add_argument("--compress", action="store_true", help="send the file zlib compressed if it compresses well and the receiver agrees")
+    args = parser.parse_args()
 
-    sender = Sender(*sys.argv[1:])
-    sender.run()
+    if args.use_async:
+        import asyncio, ptp_async
+        sender = ptp_async.AsyncSender(args.sender_port, args.receiver_port, args.filename, args.max_win, args.rot,
+                                       sack=args.sack, fixed_rto=args.fixed_rto, cc=args.cc, cwnd_trace=args.cwnd_trace,
+                                       mss=args.mss, sndbuf=args.sndbuf, rcvbuf=args.rcvbuf, trace=args.trace,
+                                       metrics_target=args.metrics, metrics_interval=args.metrics_interval, summary=args.summary,
+                                       compress=args.compress)
+        asyncio.run(sender.send_file(args.filename))
+    else:
+        sender = Sender(args.sender_port, args.receiver_port, args.filename, args.max_win, args.rot,
+                        sack=args.sack, fixed_rto=args.fixed_rto, cc=args.cc, cwnd_trace=args.cwnd_trace,
+                        mss=args.mss, sndbuf=args.sndbuf, rcvbuf=args.rcvbuf, trace=args.trace,
+                        metrics_target=args.metrics, metrics_interval=args.metrics_interval, summary=args.summary,
+                        compress=args.compress)
+        sender.run()
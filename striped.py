@@ -0,0 +1,119 @@
+"""
+    Striped transfer of one file over several PTP connections
+    Python 3
+    Usage: python3 striped.py receive receiver_port sender_port FileReceived.txt flp rlp [--streams K] [options]
+           python3 striped.py send sender_port receiver_port FileToSend.txt max_win rot [--streams K] [options]
+    coding: utf-8
+
+    Notes:
+        One Sender and one Receiver are bound to one core. This splits the file into K byte ranges
+        (default 4) and sends each range over its own connection, every connection in its own process.
+        Connection i uses receiver_port + i and sender_port + i:
+            python3 striped.py receive 9000 10000 FileReceived.txt 0 0 --streams 4
+            python3 striped.py send 10000 9000 asyoulik.txt 64000 100 --streams 4
+        Each sender offers the offset of its range in the SYN, the receivers write their range in place
+        in the shared output file, so it ends up byte for byte the file sent. Both sides use the same
+        number of streams. Every connection writes the usual log, Sender_log-i.txt and Receiver_log-i.txt.
+        Both sides print the bytes, time and throughput of each connection and of the whole transfer.
+"""
+import os, sys, time, argparse, logging
+from concurrent.futures import ProcessPoolExecutor
+import segment
+import metrics
+import sender
+import receiver
+
+DEFAULT_STREAMS = 4
+
+
+# the byte ranges (offset, length) of a file of size bytes split over streams connections
+def split(size, streams):
+    bounds = [size * i // streams for i in range(streams + 1)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(streams)]
+
+def send_range(stream, sender_port, receiver_port, filename, max_win, rot, ranges, options):
+    offset, length = ranges[stream]
+    ptp = sender.Sender(sender_port + stream, receiver_port + stream, filename, max_win, rot, log_file=f"Sender_log-{stream}.txt",
+                        offset=offset, length=length, **options)
+    # the packet lines go to the connection's log only, not through the root handler to stderr
+    ptp.logging.propagate = False
+    ptp.run()
+    return dict(ptp.stats(), start=ptp.start_time)
+
+def receive_range(stream, receiver_port, sender_port, filename, flp, rlp, options):
+    ptp = receiver.Receiver(receiver_port + stream, sender_port + stream, filename, flp, rlp, log_file=f"Receiver_log-{stream}.txt",
+                            **options)
+    ptp.logging.propagate = False
+    ptp.run()
+    return dict(ptp.stats(), start=ptp.start_time)
+
+# run job(stream, *args) for every stream, each in its own process, return their stats and the time taken
+def run_streams(streams, job, *args):
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=streams) as pool:
+        futures = [pool.submit(job, stream, *args) for stream in range(streams)]
+        results = [future.result() for future in futures]
+    return results, transfer_time(results, time.time() - start)
+
+# from the first SYN to the end of the last connection, so process start-up and the receivers' TIME_WAIT
+# do not count, wall if a connection never started
+def transfer_time(results, wall):
+    if any(stats["start"] is None or stats["elapsed"] is None for stats in results):
+        return wall
+    return max(stats["start"] + stats["elapsed"] for stats in results) - min(stats["start"] for stats in results)
+
+# print the bytes each connection moved, field of its stats, and the time and throughput of each and of all of them
+def report(results, elapsed, field):
+    total = 0
+    print(f"{'stream':>6}{'bytes':>14}{'time (s)':>10}{'MB/s':>9}")
+    for stream, stats in enumerate(results):
+        nbytes = stats[field]
+        total += nbytes
+        print(f"{stream:>6}{nbytes:>14}{stats['elapsed'] or 0:>10.2f}{(metrics.rate(nbytes, stats['elapsed']) or 0) / 1e6:>9.2f}")
+    print(f"{'all':>6}{total:>14}{elapsed:>10.2f}{(metrics.rate(total, elapsed) or 0) / 1e6:>9.2f}")
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING, format='%(asctime)s,%(msecs)03d %(levelname)-8s %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S')
+
+    parser = argparse.ArgumentParser(description="Striped transfer of one file over several PTP connections")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    send_parser = commands.add_parser("send", help="send a file over K connections")
+    send_parser.add_argument("sender_port", type=int)
+    send_parser.add_argument("receiver_port", type=int)
+    send_parser.add_argument("filename")
+    send_parser.add_argument("max_win", type=int, help="window of each connection in bytes")
+    send_parser.add_argument("rot", type=int)
+    send_parser.add_argument("--cc", default="reno")
+    send_parser.add_argument("--mss", type=int, default=segment.DEFAULT_MSS)
+    send_parser.add_argument("--compress", action="store_true", help="compress each range, see compression.py")
+
+    receive_parser = commands.add_parser("receive", help="receive a file over K connections")
+    receive_parser.add_argument("receiver_port", type=int)
+    receive_parser.add_argument("sender_port", type=int)
+    receive_parser.add_argument("filename")
+    receive_parser.add_argument("flp")
+    receive_parser.add_argument("rlp")
+    receive_parser.add_argument("--mss", type=int, default=segment.MAX_MSS)
+
+    for command in (send_parser, receive_parser):
+        command.add_argument("--streams", type=int, default=DEFAULT_STREAMS, help=f"number of connections (default: {DEFAULT_STREAMS})")
+        command.add_argument("--trace", action="store_true", help="write binary traces instead of text logs")
+        command.add_argument("--summary", action="store_true", help="also write each connection's final stats as JSON")
+    args = parser.parse_args()
+
+    options = {"mss": args.mss, "trace": args.trace, "summary": args.summary}
+    if args.command == "send":
+        options["cc"] = args.cc
+        options["compress"] = args.compress
+        ranges = split(os.path.getsize(args.filename), args.streams)
+        results, elapsed = run_streams(args.streams, send_range, args.sender_port, args.receiver_port, args.filename, args.max_win, args.rot,
+                                       ranges, options)
+        report(results, elapsed, "original_acked")
+    else:
+        # the connections only write their own range, start from an empty file
+        open(args.filename, 'wb').close()
+        results, elapsed = run_streams(args.streams, receive_range, args.receiver_port, args.sender_port, args.filename, args.flp, args.rlp,
+                                       options)
+        report(results, elapsed, "bytes_written")
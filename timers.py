@@ -0,0 +1,131 @@
+"""
+    Retransmission timers for the PTP Sender
+    Python 3
+    coding: utf-8
+
+    Notes:
+        TimerHeap keeps one deadline per key (the seqno of an in-flight segment) in a binary heap.
+        Adding a timer is O(log n). Cancelling one is O(1): the key is dropped from the live map and
+        its heap entry is skipped when it reaches the top. The heap is rebuilt when stale entries
+        pile up, so it stays proportional to the number of live timers.
+
+        RttEstimator computes the retransmission timeout from RTT samples as in RFC 6298
+        (Jacobson/Karels): SRTT and RTTVAR are smoothed with gains 1/8 and 1/4 and
+        RTO = SRTT + max(G, 4 * RTTVAR), clamped to [MIN_RTO, MAX_RTO]. A receiver that delays its ACKs
+        announces the delay and it is added to MIN_RTO. Every expiry doubles a separate backoff
+        multiplier. Callers must not sample retransmitted segments (Karn) and clear the backoff when an
+        ACK moves the cumulative point forward, as Linux does, since at high loss every segment is
+        retransmitted and a valid sample may never come.
+"""
+import heapq, itertools
+
+# bounds of the adaptive retransmission timeout, in seconds, the floor is Linux's: on a steady path
+# SRTT + 4 * RTTVAR is barely above the RTT and the smallest delay spike would fire spurious timeouts
+MIN_RTO = 0.2
+# far lower than RFC 6298's 60 s, this tool runs over loopback or a local relay where a longer
+# wait only stalls a lossy transfer
+MAX_RTO = 1
+# clock granularity G
+GRANULARITY = 0.001
+
+
+class TimerHeap:
+    def __init__(self) -> None:
+        # (deadline, insertion order, key), the order breaks ties so keys are never compared
+        self.heap = []
+        # key -> deadline of its live timer
+        self.deadlines = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    # start or restart the timer of key
+    def add(self, key, deadline):
+        self.deadlines[key] = deadline
+        heapq.heappush(self.heap, (deadline, next(self.counter), key))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.compact()
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+
+    # the earliest live deadline, None if no timer is running
+    def next_deadline(self):
+        self.drop_stale()
+        if self.heap:
+            return self.heap[0][0]
+        return None
+
+    # remove and return the keys whose deadline is at or before now, earliest first
+    def pop_expired(self, now):
+        expired = []
+        self.drop_stale()
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self.heap)
+            del self.deadlines[key]
+            expired.append(key)
+            self.drop_stale()
+        return expired
+
+    # pop cancelled or restarted entries off the top of the heap
+    def drop_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if self.deadlines.get(entry[2]) == entry[0]]
+        heapq.heapify(self.heap)
+
+
+class RttEstimator:
+    def __init__(self, initial_rto, fixed=False) -> None:
+        '''
+        :param initial_rto: the timeout in seconds used before the first RTT sample.
+        :param fixed: keep initial_rto for every retransmission, samples are still taken for the stats.
+        '''
+        self.base_rto = initial_rto
+        self.fixed = fixed
+        self.min_rto = MIN_RTO
+        # doubled on every expiry, back to 1 on forward progress
+        self.backoff_factor = 1
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+
+    # the timeout to use for the next timer, the computed RTO times the backoff
+    @property
+    def rto(self):
+        if self.backoff_factor == 1:
+            return self.base_rto
+        return max(self.base_rto, min(self.base_rto * self.backoff_factor, MAX_RTO))
+
+    # fold in the round trip time of a segment that was sent only once
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+        if not self.fixed:
+            self.base_rto = max(min(self.srtt + max(GRANULARITY, 4 * self.rttvar), MAX_RTO), self.min_rto)
+
+    # the receiver may hold an ACK back for delay seconds, an RTO below that fires before the ACK is due
+    def add_ack_delay(self, delay):
+        self.min_rto = MIN_RTO + delay
+        if not self.fixed:
+            self.base_rto = max(self.base_rto, self.min_rto)
+
+    # a retransmission timer expired
+    def backoff(self):
+        if not self.fixed and self.base_rto * self.backoff_factor < MAX_RTO:
+            self.backoff_factor *= 2
+
+    # an ACK acknowledged new data, the RTO goes back to the one computed from SRTT and RTTVAR
+    def reset_backoff(self):
+        self.backoff_factor = 1